@@ -1,74 +1,503 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_cors import CORS
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+import atexit
+import gc
+import hashlib
 import json
+import math
 import random
+import threading
 import time
 import os
+import uuid
 from datetime import datetime
+from cohort_stats import CohortExports, CohortStats
+from courses import CourseNotFound, CourseRegistry
+from event_log import AnswerEventLog
+from learner_random import LearnerRandom, learner_seed
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, ROUTE_KEY as METRICS_ROUTE_KEY, metrics
+from persistence import SharedStateStore, WriteBehindWriter, create_backend
+from question_loader import gc_paused, load_questions
+from spaced_repetition import ReviewScheduler, review_quality
 
 app = Flask(__name__)
 CORS(app)
 
-# Global AI engine instance
-ai_engine = None
+QUESTION_BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_questions.json')
+COURSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'courses')
+DEFAULT_COURSE = 'cs-f111'  # Built-in course: CS_F111_AI_Engine, LEARNING_TIPS and question_bank
+# Deterministic mode: each learner's RNG stream starts from (RANDOM_SEED, learner id)
+RANDOM_SEED = os.environ.get('RANDOM_SEED') or None
+
+
+class EngineSessionStore:
+    """
+    Per-learner store of CS_F111_AI_Engine instances
+    Keeps engines in LRU order so lookups, idle expiry and evictions are O(1)
+    """
+    def __init__(self, max_sessions=10000, idle_ttl=1800, engine_factory=None, loader=None):
+        self.max_sessions = max_sessions    # Hard cap on engines held in RAM
+        self.idle_ttl = idle_ttl            # Seconds before an idle learner is dropped
+        self.engine_factory = engine_factory
+        self.loader = loader                # learner_id -> persisted engine or None
+
+        # learner_id -> [engine, last_access], oldest access first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, learner_id, engine_class=None):
+        """Return the learner's engine, creating it (as engine_class) on first access"""
+        now = time.time()
+        with self._lock:
+            self._expire_idle(now)
+
+            entry = self._sessions.get(learner_id)
+            if entry is not None:
+                self.hits += 1
+                entry[1] = now
+                self._sessions.move_to_end(learner_id)
+                return entry[0]
+
+            self.misses += 1
+
+        # Load outside the store lock so a cold learner's disk read never holds up lookups
+        # for other learners (learner_engine() already serializes requests for this one)
+        engine = self.loader(learner_id, engine_class) if self.loader else None
+        if engine is None:
+            factory = engine_class or self.engine_factory or CS_F111_AI_Engine
+            engine = factory()
+
+        with self._lock:
+            entry = self._sessions.get(learner_id)
+            if entry is not None:
+                # Loaded concurrently by a caller outside learner_engine(); keep the first
+                entry[1] = now
+                self._sessions.move_to_end(learner_id)
+                return entry[0]
+            self._sessions[learner_id] = [engine, now]
+
+            # Enforce the memory cap by dropping least recently used learners
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            return engine
+
+    def discard(self, learner_id):
+        """Drop a learner's engine if present"""
+        with self._lock:
+            return self._sessions.pop(learner_id, None) is not None
+
+    def _expire_idle(self, now):
+        """Drop idle sessions from the LRU head (amortised O(1) per call)"""
+        if self.idle_ttl is None:
+            return
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            learner_id, entry = next(iter(self._sessions.items()))
+            if entry[1] > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, learner_id):
+        return learner_id in self._sessions
+
+    def stats(self):
+        """Return session store counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'active_sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'idle_ttl': self.idle_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0
+            }
+
+
+class LearnerLocks:
+    """
+    Per-learner mutual exclusion for threaded serving (Flask threaded, gunicorn gthread)
+    Engines are not thread-safe on their own: an answer is many read-modify-write
+    updates. Learner ids hash onto a fixed set of lock stripes, so there is no lock
+    object per learner to create or expire; two learners share a stripe only by chance
+    """
+    def __init__(self, stripes=1024):
+        self.stripes = stripes
+        self._locks = tuple(threading.Lock() for _ in range(stripes))
+
+    def lock(self, learner_id):
+        return self._locks[hash(learner_id) % self.stripes]
+
+
+# Durable learner state (write-behind, so requests never wait on disk)
+_state_db = os.environ.get('LEARNER_STATE_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'learner_state.db')
+_state_backend = create_backend(os.environ.get('LEARNER_STATE_BACKEND', 'sqlite'), _state_db)
+
+# Multi-worker deployments share state through SQLite with per-learner locks
+if _state_backend is not None and os.environ.get('LEARNER_STATE_SHARED', '').lower() in ('1', 'true', 'yes'):
+    shared_state = SharedStateStore(_state_backend, _state_db + '.locks')
+    learner_state = None
+else:
+    shared_state = None
+    learner_state = WriteBehindWriter(_state_backend) if _state_backend is not None else None
+
+
+def load_learner_engine(learner_id, engine_class=None):
+    """Rehydrate a learner's engine from persisted state, if any"""
+    if learner_state is None:
+        return None
+    try:
+        data = learner_state.load(learner_id)
+        return (engine_class or CS_F111_AI_Engine).deserialize(data) if data else None
+    except Exception as e:
+        print(f"Error loading state for learner {learner_id}: {e}")
+        metrics.exception('load_learner_engine', e)
+        return None
+
+
+def save_learner_engine(learner_id, engine):
+    """Queue a snapshot of the learner's engine for persistence"""
+    if learner_state is not None:
+        learner_state.save(learner_id, engine.serialize())
+
+
+# Largest answer batch accepted by /api/answers
+MAX_BATCH_ANSWERS = int(os.environ.get('MAX_BATCH_ANSWERS', 500))
+
+# Append-only answer event log for replay and backfill (ANSWER_EVENT_LOG=none disables)
+_event_log_path = os.environ.get('ANSWER_EVENT_LOG') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'answer_events.jsonl')
+answer_log = AnswerEventLog(_event_log_path) if _event_log_path.lower() != 'none' else None
+
+
+class InsightsSubscriber:
+    """
+    Mailbox for one streaming client
+    Keeps only the newest insights per learner, so slow clients never queue up
+    """
+    def __init__(self, learner_id=None, notify=None):
+        self.learner_id = learner_id    # None subscribes to every learner
+        self._notify = notify           # Extra wake-up hook (used by async clients)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def push(self, learner_id, insights):
+        with self._lock:
+            self._pending[learner_id] = insights
+        self._event.set()
+        if self._notify:
+            self._notify()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    def drain(self):
+        """Take every pending learner -> insights update"""
+        self._event.clear()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+class InsightsBroker:
+    """Fan-out of insights updates to streaming subscribers"""
+    def __init__(self):
+        self._by_learner = {}   # learner_id -> set of subscribers
+        self._all = set()       # Subscribers watching every learner (instructor views)
+        self._lock = threading.Lock()
+
+    def subscribe(self, learner_id=None, notify=None):
+        subscriber = InsightsSubscriber(learner_id, notify)
+        with self._lock:
+            if learner_id is None:
+                self._all.add(subscriber)
+            else:
+                self._by_learner.setdefault(learner_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber.learner_id is None:
+                self._all.discard(subscriber)
+            else:
+                subscribers = self._by_learner.get(subscriber.learner_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._by_learner.pop(subscriber.learner_id, None)
+
+    def has_subscribers(self, learner_id):
+        return bool(self._all) or learner_id in self._by_learner
+
+    def publish(self, learner_id, insights):
+        with self._lock:
+            subscribers = list(self._all) + list(self._by_learner.get(learner_id, ()))
+        for subscriber in subscribers:
+            subscriber.push(learner_id, insights)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'learner_streams': sum(len(s) for s in self._by_learner.values()),
+                'class_streams': len(self._all)
+            }
+
+
+def insights_delta(previous, current):
+    """Top-level insight fields that changed since the previous snapshot"""
+    if previous is None:
+        return current
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+def format_sse(event, data, event_id=None):
+    """Encode one server-sent event"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(',', ':')))
+    return "\n".join(lines) + "\n\n"
+
+
+# Live insights feed (only the worker that handled the answer publishes it)
+insights_broker = InsightsBroker()
+SSE_KEEPALIVE = 15  # Seconds between keep-alive comments
+
+
+# Per-learner AI engine instances, used under their learner's lock
+learner_locks = LearnerLocks(int(os.environ.get('LEARNER_LOCK_STRIPES', 1024)))
+engine_sessions = EngineSessionStore(
+    max_sessions=int(os.environ.get('ENGINE_MAX_SESSIONS', 10000)),
+    idle_ttl=float(os.environ.get('ENGINE_SESSION_TTL', 1800)),
+    loader=load_learner_engine
+)
+
+
+# Cohort statistics per course, updated by every graded answer (/api/cohort-insights)
+cohort_stats = {}
+_cohort_stats_lock = threading.Lock()
+MAX_MOST_MISSED = 100
+
+# Multi-worker deployments merge every worker's statistics through a shared directory
+_cohort_stats_dir = os.environ.get('COHORT_STATS_DIR') or None
+cohort_exports = CohortExports(_cohort_stats_dir, float(os.environ.get('COHORT_STATS_EXPORT_INTERVAL', 1.0))) if _cohort_stats_dir else None
+if cohort_exports is not None:
+    cohort_exports.start(cohort_stats)
+
+
+def get_cohort_stats(course=None):
+    """The course's cohort statistics (None: the built-in course), created on first use"""
+    course_id = course.id if course is not None else DEFAULT_COURSE
+    stats = cohort_stats.get(course_id)
+    if stats is None:
+        with _cohort_stats_lock:
+            stats = cohort_stats.get(course_id)
+            if stats is None:
+                topics = (course.engine_class if course is not None else CS_F111_AI_Engine).TOPICS
+                stats = cohort_stats[course_id] = CohortStats(topics)
+    return stats
+
+
+# Browser learners are identified by a plain learner_id cookie (no signing key, so the
+# identity survives restarts and is the same on every worker and in asgi.py)
+LEARNER_COOKIE = 'learner_id'
+LEARNER_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+
+def get_learner_id():
+    """Resolve the learner id from header, query, JSON body or learner_id cookie"""
+    learner_id = request.headers.get('X-Learner-Id') or request.args.get('learner_id')
+    if not learner_id and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            learner_id = body.get('learner_id')
+    if not learner_id:
+        learner_id = request.cookies.get(LEARNER_COOKIE)
+        if not learner_id:
+            learner_id = g.new_learner_id = uuid.uuid4().hex
+    return str(learner_id)
+
+
+@app.after_request
+def set_learner_cookie(response):
+    """Hand a newly created learner id to the browser"""
+    learner_id = g.get('new_learner_id')
+    if learner_id:
+        response.set_cookie(LEARNER_COOKIE, learner_id, max_age=LEARNER_COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def get_course():
+    """
+    Resolve the course from the X-Course-Id header or ?course= query
+    Returns None for the built-in course; raises CourseNotFound for unknown courses
+    """
+    return resolve_course(request.headers.get('X-Course-Id') or request.args.get('course'))
+
+
+def resolve_course(course_id):
+    """Course for an id (None for the built-in course), loading it on first use"""
+    if not course_id or course_id == DEFAULT_COURSE:
+        return None
+    course = courses.get(course_id)
+    if course is None:
+        raise CourseNotFound(course_id)
+    return course
+
+
+def course_scope(learner_id, course):
+    """(question bank, learner key, calibrator) for a learner of course (None: the built-in course)"""
+    if course is None:
+        return get_question_bank(), learner_id, get_calibrator()
+    return course.bank, course.learner_key(learner_id), None
+
+
+def seeded(engine, learner_id):
+    """In deterministic mode, start a new learner's RNG stream from the run seed"""
+    if RANDOM_SEED is not None and not engine.seeded:
+        engine.seed(learner_seed(RANDOM_SEED, learner_id))
+    return engine
+
+
+@contextmanager
+def learner_engine(learner_id, update=False, engine_class=None):
+    """
+    Yield the learner's AI engine; with update=True the new state is persisted
+    The learner's lock is held throughout (reads also advance the engine's random stream
+    and recently-served list), so concurrent requests for one learner apply in turn.
+    In shared mode every request is an atomic read-modify-write across workers: a read
+    that advanced the engine is saved too, or the next request (in any worker) would
+    start from the same stream and serve the same question
+    """
+    if shared_state is None:
+        with learner_locks.lock(learner_id):
+            engine = seeded(engine_sessions.get(learner_id, engine_class), learner_id)
+            yield engine
+            if update:
+                save_learner_engine(learner_id, engine)
+        return
+
+    engine_class = engine_class or CS_F111_AI_Engine
+    with shared_state.lock(learner_id):
+        data = shared_state.load(learner_id)
+        engine = seeded(engine_class.deserialize(data) if data else engine_class(), learner_id)
+        yield engine
+        state = engine.serialize()
+        if update or state != data:
+            shared_state.save(learner_id, state)
 
 @app.route('/')
 def index():
+    if not request.cookies.get(LEARNER_COOKIE):
+        get_learner_id()  # Issue the cookie with the page, before the first API call
     return render_template('index.html')
 
 # ADD THESE MISSING API ENDPOINTS:
 
-@app.route('/api/question', methods=['GET'])
-def get_question():
-    global ai_engine
-    try:
-        # Initialize AI engine if not exists
-        if ai_engine is None:
-            ai_engine = CS_F111_AI_Engine()
-        
-        # Load questions
-        questions = load_cs_f111_questions()
-        
-        # Select optimal question using AI
-        selected_question = ai_engine.select_optimal_question(questions)
+# API HANDLERS (shared by the Flask routes and the ASGI app in asgi.py)
+# Each returns (payload, status); payload values may be pre-encoded RawJSON fragments
+
+class RawJSON:
+    """Already-encoded JSON spliced verbatim into a response by encode_payload"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+_encode_json = json.JSONEncoder(separators=(',', ':')).encode
+
+def _holds_raw(value):
+    """A list of result dicts carrying RawJSON members (e.g. /api/answers results)"""
+    return isinstance(value, list) and any(
+        isinstance(item, dict) and any(isinstance(member, RawJSON) for member in item.values())
+        for item in value
+    )
+
+def encode_payload(payload):
+    """
+    Encode a response dict, splicing in RawJSON values instead of re-serializing them
+    Dynamic values are encoded in one call; raw members are appended after them
+    Lists of dicts holding RawJSON members are encoded item by item the same way
+    """
+    raw = []
+    for key, value in payload.items():
+        if isinstance(value, RawJSON):
+            raw.append((key, value.text))
+        elif _holds_raw(value):
+            items = (encode_payload(item) if isinstance(item, dict) else _encode_json(item) for item in value)
+            raw.append((key, '[' + ','.join(items) + ']'))
+    if not raw:
+        return _encode_json(payload)
+    raw_keys = {key for key, _ in raw}
+    dynamic = _encode_json({key: value for key, value in payload.items() if key not in raw_keys})
+    members = ','.join(_encode_json(key) + ':' + text for key, text in raw)
+    return dynamic[:-1] + (',' if len(dynamic) > 2 else '') + members + '}'
+
+def json_response(payload, status):
+    return Response(encode_payload(payload), status=status, mimetype='application/json')
+
+def serve_question(learner_id, course=None):
+    """Select the next question for a learner"""
+    bank, learner_id, calibrator = course_scope(learner_id, course)
+    # Get (or create) this learner's AI engine
+    with learner_engine(learner_id, engine_class=course and course.engine_class) as ai_engine:
+        # Select optimal question using AI (calibrated difficulty targeting when enabled)
+        if calibrator is not None:
+            selected_question = ai_engine.select_optimal_question(
+                bank, calibrator.ability_of(learner_id), calibrator.index
+            )
+        else:
+            selected_question = ai_engine.select_optimal_question(bank)
         
         if selected_question is None:
-            return jsonify({'error': 'No questions available'}), 500
+            return {'error': 'No questions available'}, 500
         
         # Get current performance insights
         insights = ai_engine.get_performance_insights()
-        
-        return jsonify({
-            'question': selected_question,
-            'insights': insights
-        })
-        
-    except Exception as e:
-        print(f"Error in /api/question: {e}")
-        return jsonify({'error': 'Failed to load question'}), 500
+    
+    return {
+        'question': bank.encoded(selected_question).client,
+        'insights': insights
+    }, 200
 
-@app.route('/api/answer', methods=['POST'])
-def submit_answer():
-    global ai_engine
-    try:
-        if ai_engine is None:
-            ai_engine = CS_F111_AI_Engine()
-            
-        data = request.get_json()
-        question_id = data.get('question_id')
-        user_answer = data.get('answer')
-        time_taken = data.get('time_taken', 15)
-        
-        # Find the question
-        questions = load_cs_f111_questions()
-        question = next((q for q in questions if q['id'] == question_id), None)
-        
-        if not question:
-            return jsonify({'error': 'Question not found'}), 404
-        
-        # Check if answer is correct
-        is_correct = user_answer == question['correct']
-        
+def serve_answer(learner_id, data, course=None):
+    """Grade an answer and update the learner's AI engine"""
+    if not isinstance(data, dict):
+        return {'error': 'Expected a JSON object'}, 400
+    bank, learner_id, calibrator = course_scope(learner_id, course)
+    question_id = data.get('question_id')
+    user_answer = data.get('answer')
+    time_taken = data.get('time_taken', 15)
+    
+    # Find the question
+    question = bank.get(question_id)
+    
+    if not question:
+        return {'error': 'Question not found'}, 404
+    if not valid_time_taken(time_taken):
+        return {'error': TIME_TAKEN_ERROR}, 400
+    
+    # Check if answer is correct
+    is_correct = user_answer == question['correct']
+    cohort = get_cohort_stats(course)
+    
+    with learner_engine(learner_id, update=True, engine_class=course and course.engine_class) as ai_engine:
         # Update AI engine with performance data
         ai_engine.analyze_performance(
             is_correct=is_correct,
@@ -77,6 +506,24 @@ def submit_answer():
             topic=question.get('topic', 'General')
         )
         
+        ai_engine.record_review(question_id, is_correct, time_taken)
+        if calibrator is not None:
+            calibrator.observe(learner_id, question_id, is_correct)
+        cohort.record_answer(question_id, question.get('topic', 'General'), is_correct, time_taken)
+        cohort.update_learner(learner_id, ai_engine.cohort_scores())
+        
+        if answer_log is not None:
+            answer_log.append({
+                'ts': round(time.time(), 3),
+                'course': course.id if course is not None else DEFAULT_COURSE,
+                'learner': learner_id,
+                'qid': question_id,
+                'topic': question.get('topic', 'General'),
+                'difficulty': question.get('difficulty', 2),
+                'correct': is_correct,
+                'time': time_taken
+            })
+        
         # Generate personalized feedback
         feedback = ai_engine.generate_feedback(
             is_correct=is_correct,
@@ -84,77 +531,401 @@ def submit_answer():
             topic=question.get('topic', 'General')
         )
         
-        # Get updated insights
+        # Get updated insights (published under the learner's lock, so streams see
+        # concurrent answers in the order they were applied)
         insights = ai_engine.get_performance_insights()
+        publish_insights(learner_id, insights)
+    encoded = bank.encoded(question)
+    
+    return {
+        'correct': is_correct,
+        'feedback': feedback,
+        'explanation': encoded.explanation,
+        'correct_answer': encoded.correct_answer,
+        'correct_option': question['correct'],
+        'learning_tips': get_learning_tips(question.get('topic', 'General'), is_correct, course),
+        'insights': insights
+    }, 200
+
+def serve_insights(learner_id, course=None):
+    """Insights with recommendations and focus areas for a learner"""
+    _, learner_id, _ = course_scope(learner_id, course)
+    with learner_engine(learner_id, engine_class=course and course.engine_class) as ai_engine:
+        insights = ai_engine.get_performance_insights()
+    
+    return with_recommendations(insights), 200
+
+def with_recommendations(insights):
+    """Add detailed recommendations and focus areas to an insights dict"""
+    insights['recommendations'] = generate_recommendations(insights)
+    insights['next_focus_areas'] = get_focus_areas(insights)
+    return insights
+
+def publish_insights(learner_id, insights):
+    """
+    Push a learner's updated insights to any live streams
+    Call with the learner's lock held: subscribers keep only the newest push per learner
+    """
+    if insights_broker.has_subscribers(learner_id):
+        insights_broker.publish(learner_id, with_recommendations(dict(insights)))
+
+def stream_events(subscriber, initial=None):
+    """
+    Server-sent event stream of insights deltas for a subscriber
+    Yields a keep-alive comment when nothing changes for SSE_KEEPALIVE seconds
+    """
+    last_sent = {}
+    event_id = 0
+    if initial is not None:
+        learner_id, insights = initial
+        last_sent[learner_id] = insights
+        yield format_sse('insights', {'learner_id': learner_id, 'insights': insights}, event_id)
+    while True:
+        if not subscriber.wait(SSE_KEEPALIVE):
+            yield ": keep-alive\n\n"
+            continue
+        for learner_id, insights in subscriber.drain().items():
+            delta = insights_delta(last_sent.get(learner_id), insights)
+            last_sent[learner_id] = insights
+            if delta:
+                event_id += 1
+                yield format_sse('insights', {'learner_id': learner_id, 'insights': delta}, event_id)
+
+def valid_time_taken(value):
+    """time_taken must be a finite, non-negative number of seconds"""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value) and value >= 0)
+
+TIME_TAKEN_ERROR = 'time_taken must be a non-negative number of seconds'
+
+def serve_answers(learner_id, data, course=None):
+    """
+    Apply a batch of answers in order (offline clients syncing a whole quiz)
+    One engine load/store and one insights computation for the whole batch
+    Every item is validated before the engine is touched: bad items come back as
+    per-item errors and never leave the batch half-applied
+    """
+    answers = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(answers, list):
+        return {'error': 'Expected an "answers" list'}, 400
+    if len(answers) > MAX_BATCH_ANSWERS:
+        return {'error': f'At most {MAX_BATCH_ANSWERS} answers per batch'}, 413
+    
+    bank, learner_id, calibrator = course_scope(learner_id, course)
+    cohort = get_cohort_stats(course)
+    
+    # Grade and validate the whole batch first
+    graded = []
+    for item in answers:
+        question_id = item.get('question_id') if isinstance(item, dict) else None
+        question = bank.get(question_id)
+        if not question:
+            graded.append({'question_id': question_id, 'error': 'Question not found'})
+            continue
+        time_taken = item.get('time_taken', 15)
+        if not valid_time_taken(time_taken):
+            graded.append({'question_id': question_id, 'error': TIME_TAKEN_ERROR})
+            continue
+        graded.append((question_id, question, item.get('answer') == question['correct'], time_taken))
+    
+    results = []
+    applied = 0
+    with learner_engine(learner_id, update=True, engine_class=course and course.engine_class) as ai_engine:
+        for entry in graded:
+            if isinstance(entry, dict):
+                results.append(entry)
+                continue
+            
+            question_id, question, is_correct, time_taken = entry
+            applied += 1
+            topic = question.get('topic', 'General')
+            difficulty = question.get('difficulty', 2)
+            
+            ai_engine.analyze_performance(
+                is_correct=is_correct,
+                difficulty=difficulty,
+                time_taken=time_taken,
+                topic=topic
+            )
+            
+            ai_engine.record_review(question_id, is_correct, time_taken)
+            if calibrator is not None:
+                calibrator.observe(learner_id, question_id, is_correct)
+            cohort.record_answer(question_id, topic, is_correct, time_taken)
+            
+            if answer_log is not None:
+                answer_log.append({
+                    'ts': round(time.time(), 3),
+                    'course': course.id if course is not None else DEFAULT_COURSE,
+                    'learner': learner_id,
+                    'qid': question_id,
+                    'topic': topic,
+                    'difficulty': difficulty,
+                    'correct': is_correct,
+                    'time': time_taken
+                })
+            
+            encoded = bank.encoded(question)
+            results.append({
+                'question_id': question_id,
+                'correct': is_correct,
+                'feedback': ai_engine.generate_feedback(is_correct=is_correct, difficulty=difficulty, topic=topic),
+                'explanation': encoded.explanation,
+                'correct_answer': encoded.correct_answer,
+                'correct_option': question['correct'],
+                'learning_tips': get_learning_tips(topic, is_correct, course)
+            })
         
-        return jsonify({
-            'correct': is_correct,
-            'feedback': feedback,
-            'explanation': question.get('explanation', 'No explanation available'),
-            'correct_answer': question['options'][question['correct']],
-            'learning_tips': get_learning_tips(question.get('topic', 'General'), is_correct),
-            'insights': insights
-        })
+        # Insights (and the learner's cohort scores) once, after the whole batch
+        if applied:
+            cohort.update_learner(learner_id, ai_engine.cohort_scores())
+        insights = ai_engine.get_performance_insights()
+        if applied:
+            publish_insights(learner_id, insights)
+    
+    return {
+        'results': results,
+        'insights': insights
+    }, 200
+
+def serve_cohort_insights(course=None, limit=10):
+    """
+    Cohort-wide readiness, competence and topic mastery distributions plus the most-missed
+    questions, from running statistics (no pass over learners); 'processes' is the number
+    of worker processes whose answers are included
+    """
+    bank, _, _ = course_scope(None, course)
+    limit = max(0, min(limit, MAX_MOST_MISSED))
+    stats = get_cohort_stats(course)
+    if cohort_exports is not None:
+        snapshot = cohort_exports.snapshot(course.id if course is not None else DEFAULT_COURSE, stats, limit)
+    else:
+        snapshot = dict(stats.snapshot(limit), processes=1)
+    most_missed = []
+    for item in snapshot['most_missed']:
+        question = bank.get(item['question_id']) or {}
+        most_missed.append(dict(item, topic=question.get('topic'), difficulty=question.get('difficulty'),
+                                question=question.get('question')))
+    return dict(snapshot, most_missed=most_missed), 200
+
+@app.route('/api/question', methods=['GET'])
+def get_question():
+    try:
+        payload, status = serve_question(get_learner_id(), get_course())
+        return json_response(payload, status)
+        
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
+    except Exception as e:
+        print(f"Error in /api/question: {e}")
+        metrics.exception('/api/question', e)
+        return jsonify({'error': 'Failed to load question'}), 500
+
+@app.route('/api/answer', methods=['POST'])
+def submit_answer():
+    try:
+        payload, status = serve_answer(get_learner_id(), request.get_json(), get_course())
+        return json_response(payload, status)
         
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
     except Exception as e:
         print(f"Error in /api/answer: {e}")
+        metrics.exception('/api/answer', e)
         return jsonify({'error': 'Failed to submit answer'}), 500
 
+@app.route('/api/answers', methods=['POST'])
+def submit_answers():
+    try:
+        payload, status = serve_answers(get_learner_id(), request.get_json(silent=True), get_course())
+        return json_response(payload, status)
+        
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
+    except Exception as e:
+        print(f"Error in /api/answers: {e}")
+        metrics.exception('/api/answers', e)
+        return jsonify({'error': 'Failed to submit answers'}), 500
+
 @app.route('/api/insights', methods=['GET'])
 def get_insights():
-    global ai_engine
     try:
-        if ai_engine is None:
-            ai_engine = CS_F111_AI_Engine()
-        
-        insights = ai_engine.get_performance_insights()
-        
-        # Add detailed recommendations
-        insights['recommendations'] = generate_recommendations(insights)
-        insights['next_focus_areas'] = get_focus_areas(insights)
-        
-        return jsonify(insights)
+        payload, status = serve_insights(get_learner_id(), get_course())
+        return json_response(payload, status)
         
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
     except Exception as e:
         print(f"Error in /api/insights: {e}")
+        metrics.exception('/api/insights', e)
         return jsonify({'error': 'Failed to get insights'}), 500
 
+@app.route('/api/cohort-insights', methods=['GET'])
+def get_cohort_insights():
+    """Instructor view across the course's learners (?limit= most-missed questions)"""
+    try:
+        payload, status = serve_cohort_insights(get_course(), request.args.get('limit', 10, type=int))
+        return json_response(payload, status)
+        
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
+    except Exception as e:
+        print(f"Error in /api/cohort-insights: {e}")
+        metrics.exception('/api/cohort-insights', e)
+        return jsonify({'error': 'Failed to get cohort insights'}), 500
+
+@app.route('/api/questions/<question_id>', methods=['GET'])
+def get_question_by_id(question_id):
+    """Client-facing question (no answer or explanation) with ETag revalidation"""
+    try:
+        bank, _, _ = course_scope(None, get_course())
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
+    question = bank.get(question_id)
+    if question is None and question_id.isdigit():
+        question = bank.get(int(question_id))
+    if question is None:
+        return jsonify({'error': 'Question not found'}), 404
+
+    encoded = bank.encoded(question)
+    if encoded.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(encoded.client.text, mimetype='application/json')
+    response.set_etag(encoded.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/insights/stream', methods=['GET'])
+def stream_insights():
+    """
+    Server-sent events feed of insights deltas, pushed only when answers change them
+    ?scope=all streams every learner (instructor class view)
+    """
+    try:
+        if request.args.get('scope') == 'all':
+            subscriber = insights_broker.subscribe()
+            initial = None
+        else:
+            course = get_course()
+            learner_id = get_learner_id()
+            _, key, _ = course_scope(learner_id, course)
+            subscriber = insights_broker.subscribe(key)
+            initial = (key, serve_insights(learner_id, course)[0])
+    except CourseNotFound:
+        return jsonify({'error': 'Course not found'}), 404
+    except Exception as e:
+        print(f"Error in /api/insights/stream: {e}")
+        metrics.exception('/api/insights/stream', e)
+        return jsonify({'error': 'Failed to open insights stream'}), 500
+
+    def events():
+        try:
+            yield from stream_events(subscriber, initial)
+        finally:
+            insights_broker.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/session-stats', methods=['GET'])
+def get_session_stats():
+    return jsonify(engine_sessions.stats())
+
+@app.route('/api/courses', methods=['GET'])
+def list_courses():
+    """Courses on disk (a directory scan) plus which are loaded; ?course=<id> describes one course"""
+    course_id = request.args.get('course')
+    if course_id:
+        try:
+            course = resolve_course(course_id)
+        except CourseNotFound:
+            return jsonify({'error': 'Course not found'}), 404
+        except Exception as e:
+            print(f"Error in /api/courses: {e}")
+            metrics.exception('/api/courses', e)
+            return jsonify({'error': 'Failed to load course'}), 500
+        if course is None:
+            return jsonify({'id': DEFAULT_COURSE, 'title': 'CS F111 Computer Programming',
+                            'topics': list(CS_F111_AI_Engine.TOPICS), 'questions': len(get_question_bank())})
+        return jsonify(course.describe())
+    return jsonify({
+        'default': DEFAULT_COURSE,
+        'courses': [DEFAULT_COURSE] + [c for c in courses.available() if c != DEFAULT_COURSE],
+        'registry': courses.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint (only when METRICS_ENABLED is set)"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+if metrics.enabled:
+    # Timed around the whole WSGI call; the route label is the rule Flask matched
+    app.wsgi_app = metrics.wsgi_middleware(app.wsgi_app)
+
+    @app.before_request
+    def label_route():
+        if request.url_rule is not None:
+            request.environ[METRICS_ROUTE_KEY] = request.url_rule.rule
+
+    metrics.gauge('engine_sessions_active', 'Learner engines held in memory', lambda: len(engine_sessions))
+    metrics.gauge('engine_session_evictions_total', 'Learner engines evicted by the LRU cap',
+                  lambda: engine_sessions.evictions, kind='counter')
+    metrics.gauge('insights_learner_streams', 'Open per-learner insights SSE streams',
+                  lambda: insights_broker.stats()['learner_streams'])
+    metrics.gauge('insights_class_streams', 'Open class-wide insights SSE streams',
+                  lambda: insights_broker.stats()['class_streams'])
+    metrics.gauge('courses_loaded', 'Courses loaded in the course registry', lambda: len(courses))
+    metrics.gauge('course_evictions_total', 'Cold courses evicted from the course registry',
+                  lambda: courses.evictions, kind='counter')
+    if learner_state is not None:
+        metrics.gauge('learner_state_pending', 'Learner snapshots queued for write-behind',
+                      lambda: learner_state.stats()['pending'])
+    metrics.start_exporter()  # Multi-worker collection, when METRICS_MULTIPROC_DIR is set
+
 # HELPER FUNCTIONS:
 
-def get_learning_tips(topic, is_correct):
-    """Generate learning tips based on topic and performance"""
-    tips = {
-        'Basic C Programming': {
-            True: "Great! Try more complex control structures to advance further.",
-            False: "Review C syntax basics: variable declarations, printf/scanf, and basic operators."
-        },
-        'Control Structures': {
-            True: "Perfect! Now practice nested conditions and complex logical expressions.",
-            False: "Focus on if-else logic, switch statements, and boolean expressions. Practice tracing code execution."
-        },
-        'Loops and Iterations': {
-            True: "Excellent loop understanding! Try problems with nested loops and pattern printing.",
-            False: "Practice for/while/do-while loops. Focus on loop initialization, condition, and increment/decrement."
-        },
-        'Arrays and Strings': {
-            True: "Strong array skills! Move to 2D arrays and string manipulation functions.",
-            False: "Review array indexing, string functions (strcpy, strlen), and array initialization."
-        },
-        'Functions and Recursion': {
-            True: "Great function concepts! Challenge yourself with recursive algorithms like Fibonacci.",
-            False: "Practice function parameters, return values, and simple recursive problems step by step."
-        },
-        'Pointers and Memory': {
-            True: "Excellent pointer mastery! Try dynamic memory allocation and pointer arithmetic.",
-            False: "Start with basic pointer concepts: address-of (&) and dereference (*) operators."
-        },
-        'Number Systems': {
-            True: "Perfect conversions! Practice more complex arithmetic in different bases.",
-            False: "Review binary, octal, hexadecimal conversions and 2's complement representation."
-        }
+LEARNING_TIPS = {
+    'Basic C Programming': {
+        True: "Great! Try more complex control structures to advance further.",
+        False: "Review C syntax basics: variable declarations, printf/scanf, and basic operators."
+    },
+    'Control Structures': {
+        True: "Perfect! Now practice nested conditions and complex logical expressions.",
+        False: "Focus on if-else logic, switch statements, and boolean expressions. Practice tracing code execution."
+    },
+    'Loops and Iterations': {
+        True: "Excellent loop understanding! Try problems with nested loops and pattern printing.",
+        False: "Practice for/while/do-while loops. Focus on loop initialization, condition, and increment/decrement."
+    },
+    'Arrays and Strings': {
+        True: "Strong array skills! Move to 2D arrays and string manipulation functions.",
+        False: "Review array indexing, string functions (strcpy, strlen), and array initialization."
+    },
+    'Functions and Recursion': {
+        True: "Great function concepts! Challenge yourself with recursive algorithms like Fibonacci.",
+        False: "Practice function parameters, return values, and simple recursive problems step by step."
+    },
+    'Pointers and Memory': {
+        True: "Excellent pointer mastery! Try dynamic memory allocation and pointer arithmetic.",
+        False: "Start with basic pointer concepts: address-of (&) and dereference (*) operators."
+    },
+    'Number Systems': {
+        True: "Perfect conversions! Practice more complex arithmetic in different bases.",
+        False: "Review binary, octal, hexadecimal conversions and 2's complement representation."
     }
-    
-    return tips.get(topic, {}).get(is_correct, "Keep practicing to improve your understanding!")
+}
+
+def get_learning_tips(topic, is_correct, course=None):
+    """Generate learning tips based on topic and performance"""
+    if course is not None:
+        return course.tip(topic, is_correct)
+    return LEARNING_TIPS.get(topic, {}).get(is_correct, "Keep practicing to improve your understanding!")
 
 def generate_recommendations(insights):
     """Generate AI recommendations based on performance"""
@@ -192,11 +963,65 @@ def get_focus_areas(insights):
     return focus_areas
 
 
+def _topic_mask(topics, subset):
+    """Bitset over topic positions for the topics in subset"""
+    subset = set(subset)
+    return sum(1 << i for i, topic in enumerate(topics) if topic in subset)
+
+
 class CS_F111_AI_Engine:
     """
     Specialized AI engine for CS F111 Computer Programming
     Based on BITS Pilani Dubai Campus past year questions
+    Not thread-safe by itself: the app uses engines only inside learner_engine(),
+    which holds the learner's lock
     """
+    # CS F111 curriculum topics
+    TOPICS = (
+        'Basic C Programming',
+        'Control Structures',
+        'Loops and Iterations',
+        'Arrays and Strings',
+        'Functions and Recursion',
+        'Pointers and Memory',
+        'Number Systems',
+        'Pattern Printing',
+        'Advanced Programming'
+    )
+    # Topics covered by each exam type
+    QUIZ_TOPICS = ('Basic C Programming', 'Control Structures', 'Loops and Iterations')
+    MIDSEM_TOPICS = QUIZ_TOPICS + ('Arrays and Strings', 'Functions and Recursion', 'Number Systems')
+
+    TOPIC_INDEX = dict(zip(TOPICS, range(len(TOPICS))))
+    _QUIZ_MASK = _topic_mask(TOPICS, QUIZ_TOPICS)
+    _MIDSEM_MASK = _topic_mask(TOPICS, MIDSEM_TOPICS)
+
+    RESPONSE_WINDOW = 10  # Response times kept for engagement analysis
+
+    # Chance of a correct answer each learning mode aims for with calibrated (IRT) selection
+    MODE_TARGET_SUCCESS = {
+        'mastery': 0.5,
+        'balanced': 0.7,
+        'gamified': 0.75,
+        'support': 0.8,
+        'confidence_building': 0.85
+    }
+    CALIBRATED_CANDIDATES = 8  # Nearest-difficulty questions to choose among
+    REPEAT_RETRIES = 3         # Re-draws when a pick was served recently
+
+    # Slotted, array-backed state keeps per-learner memory small
+    __slots__ = (
+        'competence_level', 'engagement_score', 'confidence_level',
+        'questions_answered', 'correct_answers', 'current_streak', 'max_streak',
+        'total_time_spent', 'session_start',
+        '_topic_correct', '_topic_total', '_topic_mastery',
+        '_weak_mask', '_strong_mask', 'preferred_difficulty',
+        'avg_response_time', '_response_times', '_response_count', '_response_pos',
+        'quiz_readiness', 'midsem_readiness', 'endsem_readiness',
+        '_quiz_mastery', '_midsem_mastery', '_total_mastery', '_insights',
+        '_reviews', '_rng'
+    )
+
     def __init__(self):
         # Core Learning Metrics (0-100 scale)
         self.competence_level = 50      # Overall programming competence
@@ -211,34 +1036,178 @@ class CS_F111_AI_Engine:
         self.total_time_spent = 0
         self.session_start = time.time()
         
-        # Topic-wise Performance Tracking
+        # Topic-wise Performance Tracking, indexed by TOPIC_INDEX
         # Based on CS F111 curriculum analysis
-        self.topic_performance = {
-            'Basic C Programming': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Control Structures': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Loops and Iterations': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Arrays and Strings': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Functions and Recursion': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Pointers and Memory': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Number Systems': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Pattern Printing': {'correct': 0, 'total': 0, 'mastery': 0},
-            'Advanced Programming': {'correct': 0, 'total': 0, 'mastery': 0}
-        }
+        self._topic_correct = array('i', bytes(4 * len(self.TOPICS)))
+        self._topic_total = array('i', bytes(4 * len(self.TOPICS)))
+        self._topic_mastery = array('i', bytes(4 * len(self.TOPICS)))
         
-        # Learning Patterns
-        self.weak_topics = set()
-        self.strong_topics = set()
+        # Learning Patterns (weak/strong topics as bitsets over TOPIC_INDEX)
+        self._weak_mask = 0
+        self._strong_mask = 0
         self.preferred_difficulty = 2.0
         
-        # Response Analytics
+        # Response Analytics (ring buffer of the last RESPONSE_WINDOW times)
         self.avg_response_time = 15.0  # CS questions typically need more time
-        self.response_times = []
+        self._response_times = array('d', bytes(8 * self.RESPONSE_WINDOW))
+        self._response_count = 0
+        self._response_pos = 0
         
         # Exam Preparation Tracking
         self.quiz_readiness = 0      # 0-100 for quiz preparation
         self.midsem_readiness = 0    # 0-100 for mid-semester
         self.endsem_readiness = 0    # 0-100 for end-semester
+
+        # Running mastery sums (kept in step with topic mastery) and cached insights
+        self._quiz_mastery = 0
+        self._midsem_mastery = 0
+        self._total_mastery = 0
+        self._insights = None
+
+        # Spaced-repetition review cards, created on the first answered question
+        self._reviews = None
+
+        # This learner's random stream (see learner_random.py), created on first draw
+        self._rng = None
+
+    @property
+    def topic_performance(self):
+        """Per-topic stats as a dict of dicts (read-only view)"""
+        return {
+            topic: {
+                'correct': self._topic_correct[i],
+                'total': self._topic_total[i],
+                'mastery': self._topic_mastery[i]
+            }
+            for topic, i in self.TOPIC_INDEX.items()
+        }
+
+    @property
+    def weak_topics(self):
+        return self._topics_in(self._weak_mask)
+
+    @weak_topics.setter
+    def weak_topics(self, topics):
+        self._weak_mask = _topic_mask(self.TOPICS, topics)
+        self._insights = None
+
+    @property
+    def strong_topics(self):
+        return self._topics_in(self._strong_mask)
+
+    @strong_topics.setter
+    def strong_topics(self, topics):
+        self._strong_mask = _topic_mask(self.TOPICS, topics)
+        self._insights = None
+
+    @classmethod
+    def for_topics(cls, topics, quiz_topics, midsem_topics):
+        """Engine class for another course's topic taxonomy (same behaviour and state layout)"""
+        topics = tuple(topics)
+        return type('CourseEngine', (cls,), {
+            '__slots__': (),
+            'TOPICS': topics,
+            'QUIZ_TOPICS': tuple(quiz_topics),
+            'MIDSEM_TOPICS': tuple(midsem_topics),
+            'TOPIC_INDEX': dict(zip(topics, range(len(topics)))),
+            '_QUIZ_MASK': _topic_mask(topics, quiz_topics),
+            '_MIDSEM_MASK': _topic_mask(topics, midsem_topics)
+        })
+
+    def _topics_in(self, mask):
+        """Topic names whose bits are set in mask"""
+        return {topic for topic, i in self.TOPIC_INDEX.items() if mask >> i & 1}
+
+    def _ordered_topics_in(self, mask):
+        """Topic names whose bits are set in mask, in taxonomy order (not hash order)"""
+        return [topic for topic, i in self.TOPIC_INDEX.items() if mask >> i & 1]
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            self._rng = LearnerRandom()
+        return self._rng
+
+    @property
+    def seeded(self):
+        return self._rng is not None
+
+    def seed(self, seed):
+        """Restart this learner's random stream from seed (repeatable selection and feedback)"""
+        self._rng = LearnerRandom(seed)
+
+    @property
+    def response_times(self):
+        """Recent response times, oldest first"""
+        window, count, pos = self._response_times, self._response_count, self._response_pos
+        if count < self.RESPONSE_WINDOW:
+            return window[:count].tolist()
+        return window[pos:].tolist() + window[:pos].tolist()
+
+    # Serialized state layout version, bump when fields change
+    # v2 appends the spaced-repetition review state (None when there is none)
+    # v3 appends the random stream state (None before the first draw)
+    STATE_VERSION = 3
+
+    def to_state(self):
+        """Compact, JSON-serialisable snapshot of the learner state"""
+        return [
+            self.STATE_VERSION,
+            self.competence_level, self.engagement_score, self.confidence_level,
+            self.questions_answered, self.correct_answers,
+            self.current_streak, self.max_streak,
+            self.total_time_spent, self.session_start,
+            [[topic, self._topic_correct[i], self._topic_total[i], self._topic_mastery[i]]
+             for topic, i in self.TOPIC_INDEX.items()],
+            sorted(self.weak_topics), sorted(self.strong_topics),
+            self.preferred_difficulty, self.avg_response_time, self.response_times,
+            self.quiz_readiness, self.midsem_readiness, self.endsem_readiness,
+            self._reviews.to_state() if self._reviews is not None else None,
+            self._rng.state if self._rng is not None else None
+        ]
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an engine from a to_state() snapshot (unknown topics are dropped)"""
+        if state[0] in (1, 2):
+            state = list(state) + [None] * (cls.STATE_VERSION - state[0])  # Fields added since
+        elif state[0] != cls.STATE_VERSION:
+            raise ValueError(f"Unsupported engine state version: {state[0]}")
+        engine = cls()
+        (_, engine.competence_level, engine.engagement_score, engine.confidence_level,
+         engine.questions_answered, engine.correct_answers,
+         engine.current_streak, engine.max_streak,
+         engine.total_time_spent, engine.session_start,
+         topics, weak_topics, strong_topics,
+         engine.preferred_difficulty, engine.avg_response_time, response_times,
+         engine.quiz_readiness, engine.midsem_readiness, engine.endsem_readiness, reviews, rng_state) = state
+        for topic, correct, total, mastery in topics:
+            i = cls.TOPIC_INDEX.get(topic)
+            if i is not None:
+                engine._topic_correct[i] = correct
+                engine._topic_total[i] = total
+                engine._topic_mastery[i] = mastery
+        engine.weak_topics = weak_topics
+        engine.strong_topics = strong_topics
+        recent = response_times[-cls.RESPONSE_WINDOW:]
+        engine._response_times[:len(recent)] = array('d', recent)
+        engine._response_count = len(recent)
+        engine._response_pos = len(recent) % cls.RESPONSE_WINDOW
+        engine._recount_mastery()
+        if reviews is not None:
+            engine._reviews = ReviewScheduler.from_state(reviews)
+        if rng_state is not None:
+            engine._rng = LearnerRandom(rng_state)
+        return engine
+
+    def serialize(self):
+        return json.dumps(self.to_state(), separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def deserialize(cls, data):
+        return cls.from_state(json.loads(data))
         
+    # Not timed: it is the hottest engine method and /api/answer's route timing covers it
     def analyze_performance(self, is_correct, difficulty, time_taken, topic):
         """
         Advanced performance analysis specifically for CS F111
@@ -248,24 +1217,42 @@ class CS_F111_AI_Engine:
         self.total_time_spent += time_taken
         
         # Track response times for engagement analysis
-        self.response_times.append(time_taken)
-        if len(self.response_times) > 10:
-            self.response_times.pop(0)
-        self.avg_response_time = sum(self.response_times) / len(self.response_times)
+        window = self._response_times
+        window[self._response_pos] = time_taken
+        self._response_pos = (self._response_pos + 1) % self.RESPONSE_WINDOW
+        if self._response_count < self.RESPONSE_WINDOW:
+            self._response_count += 1
+            self.avg_response_time = sum(window[:self._response_count]) / self._response_count
+        else:
+            # Sum oldest first so the average matches a plain list exactly
+            pos = self._response_pos
+            self.avg_response_time = sum(window[pos:] + window[:pos] if pos else window) / self.RESPONSE_WINDOW
+        
+        # Any answer invalidates the cached insights snapshot
+        self._insights = None
         
         # Update topic-specific performance
-        if topic in self.topic_performance:
-            self.topic_performance[topic]['total'] += 1
+        i = self.TOPIC_INDEX.get(topic)
+        if i is not None:
+            self._topic_total[i] += 1
             if is_correct:
-                self.topic_performance[topic]['correct'] += 1
+                self._topic_correct[i] += 1
             
             # Calculate topic mastery (0-100 scale)
-            topic_stats = self.topic_performance[topic]
-            if topic_stats['total'] > 0:
-                accuracy = topic_stats['correct'] / topic_stats['total']
-                # Mastery considers both accuracy and practice
-                practice_factor = min(1.0, topic_stats['total'] / 5.0)  # Full weight after 5 questions
-                topic_stats['mastery'] = int(accuracy * practice_factor * 100)
+            total = self._topic_total[i]
+            accuracy = self._topic_correct[i] / total
+            # Mastery considers both accuracy and practice
+            practice_factor = min(1.0, total / 5.0)  # Full weight after 5 questions
+            mastery = int(accuracy * practice_factor * 100)
+            
+            # Keep the readiness sums in step without re-summing every topic
+            delta = mastery - self._topic_mastery[i]
+            self._topic_mastery[i] = mastery
+            self._total_mastery += delta
+            if self._QUIZ_MASK >> i & 1:
+                self._quiz_mastery += delta
+            if self._MIDSEM_MASK >> i & 1:
+                self._midsem_mastery += delta
         
         if is_correct:
             self.correct_answers += 1
@@ -282,9 +1269,9 @@ class CS_F111_AI_Engine:
             self.competence_level = min(100, self.competence_level + competence_gain)
             
             # Mark topic as strong if performing well
-            if topic in self.topic_performance and self.topic_performance[topic]['mastery'] > 70:
-                self.strong_topics.add(topic)
-                self.weak_topics.discard(topic)
+            if i is not None and self._topic_mastery[i] > 70:
+                self._strong_mask |= 1 << i
+                self._weak_mask &= ~(1 << i)
             
             # Boost confidence
             confidence_gain = 2 + difficulty
@@ -298,9 +1285,9 @@ class CS_F111_AI_Engine:
             self.competence_level = max(0, self.competence_level - competence_loss)
             
             # Mark topic as weak if struggling
-            if topic in self.topic_performance and self.topic_performance[topic]['mastery'] < 40:
-                self.weak_topics.add(topic)
-                self.strong_topics.discard(topic)
+            if i is not None and self._topic_mastery[i] < 40:
+                self._weak_mask |= 1 << i
+                self._strong_mask &= ~(1 << i)
             
             # Small confidence reduction
             self.confidence_level = max(20, self.confidence_level - 4)
@@ -335,22 +1322,23 @@ class CS_F111_AI_Engine:
         elif not is_correct and difficulty >= self.preferred_difficulty:
             self.preferred_difficulty = max(1, self.preferred_difficulty - 0.25)
     
+    def _recount_mastery(self):
+        """Rebuild the running mastery sums from the topic mastery array"""
+        mastery = self._topic_mastery
+        self._quiz_mastery = sum(m for i, m in enumerate(mastery) if self._QUIZ_MASK >> i & 1)
+        self._midsem_mastery = sum(m for i, m in enumerate(mastery) if self._MIDSEM_MASK >> i & 1)
+        self._total_mastery = sum(mastery)
+
     def _update_exam_readiness(self):
-        """Calculate readiness for different exam types"""
+        """Calculate readiness for different exam types from the running mastery sums"""
         # Quiz readiness (focuses on basic concepts)
-        basic_topics = ['Basic C Programming', 'Control Structures', 'Loops and Iterations']
-        quiz_score = sum(self.topic_performance[topic]['mastery'] for topic in basic_topics if topic in self.topic_performance)
-        self.quiz_readiness = min(100, quiz_score // len(basic_topics) + (self.competence_level * 0.3))
+        self.quiz_readiness = min(100, self._quiz_mastery // len(self.QUIZ_TOPICS) + (self.competence_level * 0.3))
         
         # Mid-semester readiness (includes intermediate topics)
-        midsem_topics = basic_topics + ['Arrays and Strings', 'Functions and Recursion', 'Number Systems']
-        midsem_score = sum(self.topic_performance[topic]['mastery'] for topic in midsem_topics if topic in self.topic_performance)
-        self.midsem_readiness = min(100, midsem_score // len(midsem_topics) + (self.competence_level * 0.2))
+        self.midsem_readiness = min(100, self._midsem_mastery // len(self.MIDSEM_TOPICS) + (self.competence_level * 0.2))
         
         # End-semester readiness (all topics)
-        all_topics = list(self.topic_performance.keys())
-        endsem_score = sum(self.topic_performance[topic]['mastery'] for topic in all_topics)
-        self.endsem_readiness = min(100, endsem_score // len(all_topics) + (self.competence_level * 0.1))
+        self.endsem_readiness = min(100, self._total_mastery // len(self.TOPICS) + (self.competence_level * 0.1))
     
     def get_learning_mode(self):
         """Determine optimal learning mode based on AI analysis"""
@@ -365,48 +1353,120 @@ class CS_F111_AI_Engine:
         else:
             return "balanced"       # Standard progressive learning
     
-    def select_optimal_question(self, questions):
-        """AI-powered question selection for CS F111"""
+    def _mode_difficulties(self, mode, difficulties):
+        """Difficulty levels eligible for a learning mode"""
+        if mode == "mastery":
+            return [d for d in difficulties if d >= 4]
+        elif mode == "support":
+            return [d for d in difficulties if d <= 2]
+        elif mode == "gamified":
+            return [d for d in difficulties if 2 <= d <= 3]
+        elif mode == "confidence_building":
+            return [d for d in difficulties if d == 1]
+        else:  # balanced
+            target_diff = max(1, min(5, int(self.preferred_difficulty)))
+            return [d for d in difficulties if abs(d - target_diff) <= 1]
+
+    @metrics.timed('select_optimal_question')
+    def select_optimal_question(self, questions, ability=None, difficulty_index=None, now=None):
+        """
+        AI-powered question selection for CS F111
+        Due spaced-repetition reviews come first; otherwise samples from the bank's
+        difficulty/topic buckets, so cost does not grow with bank size.
+        With a calibrated difficulty_index (calibration.py) and the learner's IRT ability,
+        targets the questions nearest the difficulty the learning mode aims for instead.
+        Questions served recently are re-drawn (up to REPEAT_RETRIES times)
+        """
         if not questions:  # Handle empty questions list
             return None
-            
+
         mode = self.get_learning_mode()
-        available_questions = list(questions)
-        
-        # Filter by learning mode with fallbacks
-        candidates = available_questions  # Default fallback
-        
+        metrics.count(metrics.learning_modes, mode)
+        reviews = self._reviews
+        calibrated = ability is not None and difficulty_index is not None and len(difficulty_index)
+        bank = None
+        if reviews is not None or not calibrated:
+            bank = questions if isinstance(questions, QuestionBank) else QuestionBank(questions)
+
+        if reviews is not None:
+            question = self._due_review(bank, time.time() if now is None else now)
+            if question is not None:
+                metrics.count(metrics.reviews_served)
+                return question
+
+        for _ in range(self.REPEAT_RETRIES):
+            if calibrated:
+                question = self._select_calibrated(mode, ability, difficulty_index)
+            else:
+                question = self._select_from_buckets(mode, bank)
+            if reviews is None or question is None or not reviews.is_recent(question['id']):
+                break
+        if reviews is not None and question is not None:
+            reviews.served(question['id'])
+        return question
+
+    def _due_review(self, bank, now):
+        """Most overdue review card still in the bank (O(log n) heap lookup)"""
+        reviews = self._reviews
+        while True:
+            question_id = reviews.next_due(now)
+            if question_id is None:
+                return None
+            question = bank.get(question_id)
+            if question is not None:
+                reviews.served(question_id)
+                return question
+            reviews.forget(question_id)  # Question left the bank
+
+    def _select_from_buckets(self, mode, bank):
+        """Learning-mode difficulty buckets, weak topics preferred"""
         try:
-            if mode == "mastery":
-                temp_candidates = [q for q in available_questions if q.get('difficulty', 1) >= 4]
-                candidates = temp_candidates if temp_candidates else candidates
-            elif mode == "support":
-                temp_candidates = [q for q in available_questions if q.get('difficulty', 1) <= 2]
-                candidates = temp_candidates if temp_candidates else candidates
-            elif mode == "gamified":
-                temp_candidates = [q for q in available_questions if 2 <= q.get('difficulty', 1) <= 3]
-                candidates = temp_candidates if temp_candidates else candidates
-            elif mode == "confidence_building":
-                temp_candidates = [q for q in available_questions if q.get('difficulty', 1) == 1]
-                candidates = temp_candidates if temp_candidates else candidates
-            else:  # balanced
-                target_diff = max(1, min(5, int(self.preferred_difficulty)))
-                temp_candidates = [q for q in available_questions 
-                                 if abs(q.get('difficulty', 1) - target_diff) <= 1]
-                candidates = temp_candidates if temp_candidates else candidates
-            
+            # Filter by learning mode with fallback to the whole bank
+            difficulties = self._mode_difficulties(mode, bank.difficulties)
+            if not difficulties:
+                metrics.count(metrics.selection_fallbacks, 'no_mode_difficulty')
+                difficulties = bank.difficulties
+            candidates = [bank.by_difficulty(d) for d in difficulties]
+
             # Prioritize weak topics (70% chance)
-            if self.weak_topics and len(candidates) > 1:
-                weak_topic_questions = [q for q in candidates if q.get('topic', '') in self.weak_topics]
-                if weak_topic_questions and random.random() < 0.7:
+            if self._weak_mask and sum(map(len, candidates)) > 1:
+                weak_topic_questions = [
+                    bucket for bucket in (
+                        bank.by_topic_difficulty(topic, d)
+                        for topic in self._ordered_topics_in(self._weak_mask) for d in difficulties
+                    ) if bucket
+                ]
+                if weak_topic_questions and self.rng.random() < 0.7:
                     candidates = weak_topic_questions
-            
-            return random.choice(candidates)
-            
+
+            return choose_from_buckets(candidates, self.rng)
+
         except (KeyError, ValueError, TypeError) as e:
             # Return a random question if filtering fails
-            return random.choice(available_questions) if available_questions else None
+            metrics.count(metrics.selection_fallbacks, 'error')
+            return self.rng.choice(bank.questions) if bank.questions else None
+
+    def record_review(self, question_id, is_correct, time_taken, now=None):
+        """Schedule the next spaced-repetition review of an answered question (SM-2)"""
+        if self._reviews is None:
+            self._reviews = ReviewScheduler()
+        self._reviews.review(question_id, review_quality(is_correct, time_taken), time.time() if now is None else now)
     
+    def _select_calibrated(self, mode, ability, difficulty_index):
+        """Nearest-ability lookup over the sorted difficulty index (O(log n))"""
+        target = ability - math.log(self.MODE_TARGET_SUCCESS[mode] / (1 - self.MODE_TARGET_SUCCESS[mode]))
+
+        # Prioritize weak topics (70% chance)
+        rng = self.rng
+        candidates = None
+        if self._weak_mask and rng.random() < 0.7:
+            topic = rng.choice(self._ordered_topics_in(self._weak_mask))
+            candidates = difficulty_index.nearest(target, self.CALIBRATED_CANDIDATES, topic)
+        if not candidates:
+            candidates = difficulty_index.nearest(target, self.CALIBRATED_CANDIDATES)
+        return rng.choice(candidates)
+
+    @metrics.timed('generate_feedback')
     def generate_feedback(self, is_correct, difficulty, topic):
         """Generate personalized feedback for CS F111 students"""
         mode = self.get_learning_mode()
@@ -456,21 +1516,42 @@ class CS_F111_AI_Engine:
                     "Good try! The explanation will clarify this " + topic + " topic."
                 ]
         
-        return random.choice(messages)
+        return self.rng.choice(messages)
     
     def get_performance_insights(self):
-        """Generate comprehensive performance insights"""
+        """
+        Generate comprehensive performance insights
+        The snapshot is rebuilt only after an answer changes the state; callers get a copy
+        """
+        if self._insights is None:
+            self._insights = self._build_insights()
+        insights = dict(self._insights)
+        insights['session_time'] = round((time.time() - self.session_start) / 60, 1)
+        return insights
+
+    def cohort_scores(self):
+        """
+        Scores for cohort statistics as bytes of 0-100 values: topic mastery (in TOPICS order),
+        then quiz/midsem/endsem readiness and competence, rounded like the insights
+        """
+        return bytes((*self._topic_mastery, round(self.quiz_readiness), round(self.midsem_readiness),
+                      round(self.endsem_readiness), round(self.competence_level)))
+
+    @metrics.timed('build_insights')  # Cache hits are a dict copy; only rebuilds are worth timing
+    def _build_insights(self):
+        """Build the insights snapshot (everything except the live session time)"""
         # Prevent division by zero
         accuracy = 0 if self.questions_answered == 0 else (self.correct_answers / self.questions_answered) * 100
         
         # Get topic mastery summary with safe calculations
         topic_summary = {}
-        for topic, stats in self.topic_performance.items():
-            if stats['total'] > 0:  # Only include topics with attempts
+        for topic, i in self.TOPIC_INDEX.items():
+            total = self._topic_total[i]
+            if total > 0:  # Only include topics with attempts
                 topic_summary[topic] = {
-                    'mastery': stats['mastery'],
-                    'accuracy': round((stats['correct'] / stats['total']) * 100, 1),
-                    'questions_attempted': stats['total']
+                    'mastery': self._topic_mastery[i],
+                    'accuracy': round((self._topic_correct[i] / total) * 100, 1),
+                    'questions_attempted': total
                 }
         
         return {
@@ -482,10 +1563,10 @@ class CS_F111_AI_Engine:
             'max_streak': self.max_streak,
             'avg_response_time': round(self.avg_response_time, 1),
             'questions_answered': self.questions_answered,
-            'session_time': round((time.time() - self.session_start) / 60, 1),
+            'session_time': 0,  # Filled in per call
             'learning_mode': self.get_learning_mode(),
-            'weak_topics': list(self.weak_topics),
-            'strong_topics': list(self.strong_topics),
+            'weak_topics': self._ordered_topics_in(self._weak_mask),
+            'strong_topics': self._ordered_topics_in(self._strong_mask),
             'topic_mastery': topic_summary,
             'exam_readiness': {
                 'quiz': round(self.quiz_readiness),
@@ -494,6 +1575,107 @@ class CS_F111_AI_Engine:
             }
         }
 
+class EncodedQuestion:
+    """
+    A question's static JSON, encoded once and spliced into responses
+    client omits CLIENT_HIDDEN_FIELDS so answers never reach the browser early
+    """
+    __slots__ = ('client', 'explanation', 'correct_answer', 'etag')
+    CLIENT_HIDDEN_FIELDS = ('correct', 'explanation')
+
+    def __init__(self, question):
+        client = _encode_json({k: v for k, v in question.items() if k not in self.CLIENT_HIDDEN_FIELDS})
+        self.client = RawJSON(client)
+        self.explanation = RawJSON(json.dumps(question.get('explanation', 'No explanation available')))
+        self.correct_answer = RawJSON(json.dumps(question['options'][question['correct']]))
+        self.etag = hashlib.blake2b(client.encode('utf-8'), digest_size=12).hexdigest()
+
+class QuestionBank:
+    """
+    Immutable, indexed question bank built once at startup
+    Indexes questions by id, topic, difficulty and (topic, difficulty)
+    """
+    def __init__(self, questions):
+        # Single pass: questions may be a streaming iterator from question_loader
+        ordered = []
+        by_id = {}
+        by_topic = {}
+        by_difficulty = {}
+        by_topic_difficulty = {}
+        for q in questions:
+            if q['id'] in by_id:
+                raise ValueError(f"Duplicate question id: {q['id']}")
+            topic = q.get('topic', 'General')
+            difficulty = q.get('difficulty', 1)
+            ordered.append(q)
+            by_id[q['id']] = q
+            by_topic.setdefault(topic, []).append(q)
+            by_difficulty.setdefault(difficulty, []).append(q)
+            by_topic_difficulty.setdefault((topic, difficulty), []).append(q)
+
+        self._questions = tuple(ordered)
+        self._by_id = by_id
+        self._by_topic = {k: tuple(v) for k, v in by_topic.items()}
+        self._by_difficulty = {k: tuple(v) for k, v in by_difficulty.items()}
+        self._by_topic_difficulty = {k: tuple(v) for k, v in by_topic_difficulty.items()}
+        self._encoded = {}  # question id -> EncodedQuestion, filled on first serve
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __iter__(self):
+        return iter(self._questions)
+
+    def __contains__(self, question_id):
+        return self.get(question_id) is not None
+
+    def get(self, question_id):
+        """Look up a question by id in O(1)"""
+        try:
+            return self._by_id.get(question_id)
+        except TypeError:  # Unhashable id from a malformed request
+            return None
+
+    def encoded(self, question):
+        """Pre-encoded JSON fragments for a question of this bank (encoded once, then reused)"""
+        encoded = self._encoded.get(question['id'])
+        if encoded is None:
+            encoded = self._encoded[question['id']] = EncodedQuestion(question)
+        return encoded
+
+    def encode_all(self):
+        """Encode every question up front (e.g. before forking workers)"""
+        with gc_paused():
+            for question in self._questions:
+                self.encoded(question)
+
+    def by_topic(self, topic):
+        return self._by_topic.get(topic, ())
+
+    def by_difficulty(self, difficulty):
+        return self._by_difficulty.get(difficulty, ())
+
+    def by_topic_difficulty(self, topic, difficulty):
+        return self._by_topic_difficulty.get((topic, difficulty), ())
+
+    @classmethod
+    def from_file(cls, path, strict=True, use_cache=True):
+        """Build a bank by streaming a JSON/JSONL file (or its binary cache)"""
+        with gc_paused():
+            return cls(load_questions(path, strict=strict, use_cache=use_cache))
+
+    @property
+    def questions(self):
+        return self._questions
+
+    @property
+    def topics(self):
+        return tuple(self._by_topic)
+
+    @property
+    def difficulties(self):
+        return tuple(sorted(self._by_difficulty))
+
 def load_cs_f111_questions():
     """Load complete CS F111 questions from PYQ analysis"""
     return [
@@ -578,11 +1760,96 @@ def load_cs_f111_questions():
         }
     ]
 
+def choose_from_buckets(buckets, rng=random):
+    """Pick uniformly across several buckets without concatenating them"""
+    index = rng.randrange(sum(len(bucket) for bucket in buckets))
+    for bucket in buckets:
+        if index < len(bucket):
+            return bucket[index]
+        index -= len(bucket)
+
+def load_question_bank(path=None):
+    """Build the question bank from QUESTION_BANK_PATH, falling back to built-in PYQs"""
+    path = path or os.environ.get('QUESTION_BANK_PATH') or QUESTION_BANK_PATH
+    if os.path.exists(path):
+        try:
+            return QuestionBank.from_file(path)
+        except (OSError, ValueError) as e:
+            print(f"Error loading question bank {path}: {e}")
+    return QuestionBank(load_cs_f111_questions())
+
+# Question bank is built once and shared by every request; that happens on first use
+# (or in preload()), so importing the app stays fast however large the bank is
+question_bank = None
+_question_bank_lock = threading.Lock()
+
+def get_question_bank():
+    """The built-in course's question bank, built on first use"""
+    global question_bank
+    if question_bank is None:
+        with _question_bank_lock:
+            if question_bank is None:
+                question_bank = load_question_bank()
+    return question_bank
+
+# Other courses load on first use (COURSES_DIR/<course_id>/course.json, see courses.py)
+courses = CourseRegistry(
+    os.environ.get('COURSES_DIR') or COURSES_DIR,
+    CS_F111_AI_Engine,
+    QuestionBank.from_file,
+    max_courses=int(os.environ.get('COURSE_CACHE_SIZE', 32)),
+    max_questions=int(os.environ.get('COURSE_CACHE_QUESTIONS', 200000))
+)
+
+def load_calibrator(bank, path=None):
+    """
+    IRT difficulty calibration over the bank (needs NumPy), warm-started from path if it exists
+    At exit each process (every forked worker) merges the evidence it gathered into path
+    """
+    from calibration import Calibrator
+    calibrator = Calibrator(bank)
+    if path:
+        if os.path.exists(path):
+            try:
+                calibrator.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading calibration {path}: {e}")
+        atexit.register(calibrator.save, path)
+    return calibrator
+
+# Opt-in: CALIBRATION_ENABLED=1, with CALIBRATION_FILE to persist estimates across restarts
+CALIBRATION_ENABLED = os.environ.get('CALIBRATION_ENABLED', '').lower() in ('1', 'true', 'yes', 'on')
+calibrator = None  # Built with the bank on first use (NumPy is only imported then)
+
+def get_calibrator():
+    """The built-in course's calibrator, or None when calibration is disabled"""
+    global calibrator
+    if calibrator is None and CALIBRATION_ENABLED:
+        bank = get_question_bank()
+        with _question_bank_lock:
+            if calibrator is None:
+                calibrator = load_calibrator(bank, os.environ.get('CALIBRATION_FILE'))
+    return calibrator
+
+def preload():
+    """
+    Build shared state before forking workers (gunicorn preload_app, see gunicorn.conf.py)
+    Workers inherit the bank, its pre-encoded JSON and the calibrator copy-on-write;
+    gc.freeze() moves them out of the collected generations so collections in the
+    workers do not write to (and so copy) their pages
+    """
+    get_question_bank().encode_all()
+    get_calibrator()
+    gc.collect()
+    gc.freeze()
+
 if __name__ == '__main__':
     try:
         print("🚀 Starting CS F111 AI Learning Engine...")
         print("🌐 Server will be available at http://127.0.0.1:5000")
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        # The Werkzeug debugger runs code sent from the browser: opt-in, and localhost only
+        debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes', 'on')
+        app.run(debug=debug, host='127.0.0.1' if debug else '0.0.0.0', port=5000)
     except Exception as e:
         print(f"❌ Error starting app: {e}")
         input("Press Enter to continue...")  # Keeps window open
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Async (ASGI) serving mode for the CS F111 AI Learning Engine
+Serves /api/question, /api/answer(s), /api/insights and the insights SSE stream with async handlers;
+every other route falls through to the Flask app
+
+Run: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as learning_app
+from courses import CourseNotFound
+from metrics import metrics
+
+flask_fallback = WsgiToAsgi(learning_app.app)
+
+# (method, path) -> (handler, error message), handlers as in app.py
+ROUTES = {
+    ('GET', '/api/question'): (lambda learner_id, data, course: learning_app.serve_question(learner_id, course), 'Failed to load question'),
+    ('POST', '/api/answer'): (learning_app.serve_answer, 'Failed to submit answer'),
+    ('POST', '/api/answers'): (learning_app.serve_answers, 'Failed to submit answers'),
+    ('GET', '/api/insights'): (lambda learner_id, data, course: learning_app.serve_insights(learner_id, course), 'Failed to get insights'),
+}
+
+
+async def read_body(receive):
+    """Collect the full request body"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_json(send, payload, status, extra_headers=()):
+    body = learning_app.encode_payload(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *extra_headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def resolve_learner_id(scope, data):
+    """
+    Learner id from header, query, JSON body or learner_id cookie (like get_learner_id)
+    Returns (learner_id, set_cookie_header or None)
+    """
+    headers = dict(scope['headers'])
+    learner_id = headers.get(b'x-learner-id', b'').decode('latin-1')
+    if not learner_id:
+        learner_id = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('learner_id', [''])[0]
+    if not learner_id and isinstance(data, dict):
+        learner_id = data.get('learner_id') or ''
+    if not learner_id and b'cookie' in headers:
+        cookie = SimpleCookie(headers[b'cookie'].decode('latin-1')).get(learning_app.LEARNER_COOKIE)
+        learner_id = cookie.value if cookie else ''
+    if learner_id:
+        return str(learner_id), None
+
+    learner_id = uuid.uuid4().hex
+    cookie = (f'{learning_app.LEARNER_COOKIE}={learner_id}; Max-Age={learning_app.LEARNER_COOKIE_MAX_AGE}; '
+              'Path=/; HttpOnly; SameSite=Lax')
+    return learner_id, (b'set-cookie', cookie.encode())
+
+
+async def resolve_course(scope):
+    """Course from the X-Course-Id header or ?course= query (like get_course)"""
+    course_id = dict(scope['headers']).get(b'x-course-id', b'').decode('latin-1')
+    if not course_id:
+        course_id = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('course', [''])[0]
+    if not course_id or course_id == learning_app.DEFAULT_COURSE or course_id in learning_app.courses:
+        return learning_app.resolve_course(course_id)
+    # First use reads the course's files; keep that off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, learning_app.resolve_course, course_id)
+
+
+async def prefetch_engine(learner_id, course):
+    """
+    Load a cold learner's persisted engine in the executor, so the inline handler finds it
+    cached instead of reading SQLite on the event loop. No learner lock is taken here, so
+    the loop never waits on a lock held across a disk read
+    """
+    if learning_app.learner_state is None:
+        return
+    _, key, _ = learning_app.course_scope(learner_id, course)
+    if key not in learning_app.engine_sessions:
+        await asyncio.get_running_loop().run_in_executor(
+            None, learning_app.engine_sessions.get, key, course and course.engine_class)
+
+
+async def handle_api(scope, receive, send, handler, error_message):
+    start = time.perf_counter()
+    data = None
+    if scope['method'] == 'POST':
+        try:
+            data = json.loads(await read_body(receive) or b'null')
+        except ValueError:
+            data = None
+
+    learner_id, cookie_header = resolve_learner_id(scope, data)
+    extra_headers = [cookie_header] if cookie_header else []
+
+    try:
+        course = await resolve_course(scope)
+        if learning_app.shared_state is not None:
+            # Shared mode takes cross-process locks and writes through to SQLite
+            loop = asyncio.get_running_loop()
+            payload, status = await loop.run_in_executor(None, handler, learner_id, data, course)
+        else:
+            # Engine work is microseconds once the engine is in memory; persistence and
+            # event-log writes are queued to background writers
+            await prefetch_engine(learner_id, course)
+            payload, status = handler(learner_id, data, course)
+    except CourseNotFound:
+        payload, status = {'error': 'Course not found'}, 404
+    except Exception as e:
+        print(f"Error in {scope['path']}: {e}")
+        metrics.exception(scope['path'], e)
+        payload, status = {'error': error_message}, 500
+
+    await send_json(send, payload, status, extra_headers)
+    if metrics.enabled:
+        metrics.observe_request(scope['path'], scope['method'], status, time.perf_counter() - start)
+
+
+async def handle_insights_stream(scope, receive, send):
+    """Async twin of the Flask /api/insights/stream route (one coroutine per client)"""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    notify = lambda: loop.call_soon_threadsafe(wake.set)
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    extra_headers = []
+    initial = None
+    if query.get('scope') == ['all']:
+        subscriber = learning_app.insights_broker.subscribe(notify=notify)
+    else:
+        try:
+            course = await resolve_course(scope)
+        except CourseNotFound:
+            return await send_json(send, {'error': 'Course not found'}, 404)
+        learner_id, cookie_header = resolve_learner_id(scope, None)
+        if cookie_header:
+            extra_headers.append(cookie_header)
+        _, key, _ = learning_app.course_scope(learner_id, course)
+        subscriber = learning_app.insights_broker.subscribe(key, notify)
+        if learning_app.shared_state is not None:
+            insights, _ = await loop.run_in_executor(None, learning_app.serve_insights, learner_id, course)
+        else:
+            await prefetch_engine(learner_id, course)
+            insights, _ = learning_app.serve_insights(learner_id, course)
+        initial = (key, insights)
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    last_sent = {}
+    event_id = 0
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'access-control-allow-origin', b'*'),
+                *extra_headers
+            ]
+        })
+        if initial is not None:
+            learner_id, insights = initial
+            last_sent[learner_id] = insights
+            event = learning_app.format_sse('insights', {'learner_id': learner_id, 'insights': insights}, event_id)
+            await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+
+        while not disconnected.done():
+            woken = asyncio.ensure_future(wake.wait())
+            await asyncio.wait({woken, disconnected}, timeout=learning_app.SSE_KEEPALIVE,
+                               return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                break
+            if not wake.is_set():
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                continue
+
+            wake.clear()
+            chunks = []
+            for learner_id, insights in subscriber.drain().items():
+                delta = learning_app.insights_delta(last_sent.get(learner_id), insights)
+                last_sent[learner_id] = insights
+                if delta:
+                    event_id += 1
+                    chunks.append(learning_app.format_sse('insights', {'learner_id': learner_id, 'insights': delta}, event_id))
+            if chunks:
+                await send({'type': 'http.response.body', 'body': ''.join(chunks).encode(), 'more_body': True})
+    except OSError:
+        pass  # Client went away mid-send
+    finally:
+        disconnected.cancel()
+        learning_app.insights_broker.unsubscribe(subscriber)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Build the question bank before reporting ready, so first requests do not pay for it
+            await asyncio.get_running_loop().run_in_executor(None, learning_app.preload)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Flush queued learner snapshots and answer events
+            loop = asyncio.get_running_loop()
+            for writer in (learning_app.learner_state, learning_app.answer_log):
+                if writer is not None:
+                    await loop.run_in_executor(None, writer.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/api/insights/stream':
+        return await handle_insights_stream(scope, receive, send)
+
+    route = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if route is None:
+        return await flask_fallback(scope, receive, send)
+    return await handle_api(scope, receive, send, *route)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    print("🚀 Starting CS F111 AI Learning Engine (ASGI)...")
+    uvicorn.run('asgi:application', host='0.0.0.0', port=5000)
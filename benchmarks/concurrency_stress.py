@@ -0,0 +1,178 @@
+"""
+Concurrency stress test for the per-learner locks
+Threads submit answers through the shared /api/answer handler for a few hot learners
+(heavy contention) or many (light contention), then check every learner's saved state:
+counters exact and derived state (mastery sums) consistent, i.e. no update was lost or
+torn. Reports answers/s and exits non-zero if any learner is inexact
+
+State goes through a write-behind writer on a memory backend, and engines are reloaded
+from it when --max-sessions evicts them, as in production
+
+--unlocked runs without the locks. Under the GIL a thread switch rarely lands inside the
+engine's read-modify-write windows, so --interleave widens them: analyze_performance
+reads the learner's state, sleeps, and writes back its result. Unlocked runs then lose
+updates whenever two threads answer for one learner; locked runs stay exact
+
+Usage:
+    python benchmarks/concurrency_stress.py --threads 1 4 16 --learners 1 16 1000
+    python benchmarks/concurrency_stress.py --threads 4 --learners 4 --interleave 0.001 [--unlocked]
+"""
+import argparse
+import contextlib
+import random
+import sys
+import threading
+import time
+
+from suite import app, synthetic_questions  # noqa: E402 (configures state/event log)
+from persistence import MemoryStateBackend, WriteBehindWriter
+from spaced_repetition import MAX_CARDS
+
+
+class NoLocks:
+    """Stand-in for app.learner_locks that never blocks"""
+    def lock(self, learner_id):
+        return contextlib.nullcontext()
+
+
+def engine_slots(engine_class):
+    return [name for cls in engine_class.__mro__ for name in getattr(cls, '__slots__', ())]
+
+
+def widen_race_window(delay):
+    """
+    Make analyze_performance an explicit read / sleep / write of the learner's state
+    A thread answering for the same learner during the sleep starts from the same
+    snapshot, so unless the per-learner lock serializes them one update is lost
+    Returns a callable that undoes the patch
+    """
+    engine_class = app.CS_F111_AI_Engine
+    original = engine_class.__dict__['analyze_performance']
+    slots = engine_slots(engine_class)
+
+    def analyze_performance(self, *args, **kwargs):
+        state = self.to_state()
+        time.sleep(delay)
+        scratch = type(self).from_state(state)
+        result = original(scratch, *args, **kwargs)
+        for name in slots:
+            setattr(self, name, getattr(scratch, name))
+        return result
+
+    engine_class.analyze_performance = analyze_performance
+    return lambda: setattr(engine_class, 'analyze_performance', original)
+
+
+def plan(thread_count, learners, answers, bank, seed):
+    """Per-thread answer lists plus the expected per-learner totals"""
+    rng = random.Random(seed)
+    questions = bank.questions
+    work = [[] for _ in range(thread_count)]
+    expected = {}
+    for i in range(answers):
+        learner_id = f'stress-{rng.randrange(learners)}'
+        question = questions[rng.randrange(len(questions))]
+        answer = rng.randrange(4)
+        time_taken = rng.randint(3, 40)  # Integers, so summed times are exact in any order
+        work[i % thread_count].append((learner_id, {'question_id': question['id'], 'answer': answer, 'time_taken': time_taken}))
+
+        totals = expected.setdefault(learner_id, {'answered': 0, 'correct': 0, 'time': 0, 'topics': {}, 'cards': set()})
+        totals['answered'] += 1
+        totals['correct'] += answer == question['correct']
+        totals['time'] += time_taken
+        totals['topics'][question['topic']] = totals['topics'].get(question['topic'], 0) + 1
+        totals['cards'].add(question['id'])
+    return work, expected
+
+
+def consistent(engine):
+    """Derived state agrees with the counters it is derived from (torn updates break this)"""
+    for stats in engine.topic_performance.values():
+        total = stats['total']
+        if total and stats['mastery'] != int(stats['correct'] / total * min(1.0, total / 5.0) * 100):
+            return False
+    return engine._total_mastery == sum(engine._topic_mastery)
+
+
+def mismatches(expected):
+    """Learners whose saved engine disagrees with the answers sent to it"""
+    app.learner_state.flush()
+    bad = []
+    for learner_id, totals in expected.items():
+        engine = app.load_learner_engine(learner_id)
+        if engine is None:
+            bad.append(learner_id)
+            continue
+        topics = {topic: stats['total'] for topic, stats in engine.topic_performance.items() if stats['total']}
+        if (engine.questions_answered != totals['answered'] or engine.correct_answers != totals['correct']
+                or engine.total_time_spent != totals['time'] or topics != totals['topics']
+                or len(totals['cards']) <= MAX_CARDS and len(engine._reviews) != len(totals['cards'])
+                or not consistent(engine)):
+            bad.append(learner_id)
+    return bad
+
+
+def run(thread_count, learners, answers, bank, seed, max_sessions=None):
+    # Fresh learners every run; by default sized so no engine is evicted mid-run
+    app.learner_state = WriteBehindWriter(MemoryStateBackend())
+    app.engine_sessions = app.EngineSessionStore(
+        max_sessions=max_sessions or learners + 1, idle_ttl=None, loader=app.load_learner_engine)
+    work, expected = plan(thread_count, learners, answers, bank, seed)
+    start_gate = threading.Barrier(thread_count + 1)
+
+    def worker(items):
+        start_gate.wait()
+        for learner_id, data in items:
+            payload, status = app.serve_answer(learner_id, data)
+            if status != 200:
+                raise RuntimeError(f'serve_answer failed: {payload}')
+
+    threads = [threading.Thread(target=worker, args=(items,)) for items in work]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    bad = mismatches(expected)
+    app.learner_state.close()
+    return answers / elapsed, bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress concurrent answers and check for lost updates')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--learners', type=int, nargs='+', default=[1, 16, 1000])
+    parser.add_argument('--answers', type=int, default=20000, help='answers per run')
+    parser.add_argument('--bank-size', type=int, default=1000)
+    parser.add_argument('--switch-interval', type=float, default=1e-5,
+                        help='GIL switch interval in seconds (small values provoke interleavings)')
+    parser.add_argument('--unlocked', action='store_true', help='disable the per-learner locks')
+    parser.add_argument('--interleave', type=float, default=0.0,
+                        help='seconds analyze_performance sleeps between reading and writing state (0: off)')
+    parser.add_argument('--max-sessions', type=int, help='engines kept in memory (default: every learner)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    bank = app.QuestionBank(synthetic_questions(args.bank_size, args.seed))
+    app.question_bank = bank
+    if args.unlocked:
+        app.learner_locks = NoLocks()
+    if args.interleave:
+        widen_race_window(args.interleave)
+    sys.setswitchinterval(args.switch_interval)
+
+    failed = False
+    print(f"{'threads':>8} {'learners':>9} {'answers/s':>10} {'inexact learners':>17}")
+    for learners in args.learners:
+        for thread_count in args.threads:
+            rate, bad = run(thread_count, learners, args.answers, bank, args.seed, args.max_sessions)
+            failed = failed or bool(bad)
+            print(f"{thread_count:>8} {learners:>9} {rate:>10.0f} {len(bad):>17}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
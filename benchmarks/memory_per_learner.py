@@ -0,0 +1,61 @@
+"""
+Memory footprint of CS_F111_AI_Engine learner state
+Builds N engines that have each answered a few questions and reports bytes per learner
+
+Usage: python benchmarks/memory_per_learner.py --learners 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+os.environ.setdefault('LEARNER_STATE_BACKEND', 'none')
+os.environ.setdefault('ANSWER_EVENT_LOG', 'none')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import CS_F111_AI_Engine
+
+
+def measure(learners, answers, with_insights):
+    """Return traced bytes per learner for engines that answered `answers` questions"""
+    rng = random.Random(0)
+    topics = CS_F111_AI_Engine.TOPICS
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    engines = []
+    for _ in range(learners):
+        engine = CS_F111_AI_Engine()
+        for _ in range(answers):
+            engine.analyze_performance(rng.random() < 0.6, rng.randint(1, 5), rng.uniform(3, 40), rng.choice(topics))
+        if with_insights:
+            engine.get_performance_insights()
+        engines.append(engine)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # Exclude the list holding the engines
+    return (used - sys.getsizeof(engines)) / learners
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure bytes per learner of CS_F111_AI_Engine')
+    parser.add_argument('--learners', type=int, default=20000)
+    parser.add_argument('--answers', type=int, default=15)
+    args = parser.parse_args()
+
+    fresh = measure(args.learners, 0, False)
+    active = measure(args.learners, args.answers, False)
+    polled = measure(args.learners, args.answers, True)
+    print(f"learners: {args.learners}")
+    print(f"fresh engine:                 {fresh:8.0f} bytes/learner")
+    print(f"after {args.answers} answers:             {active:8.0f} bytes/learner")
+    print(f"after answers + insights:     {polled:8.0f} bytes/learner")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Overhead of the opt-in instrumentation (METRICS_ENABLED) on the request and engine hot paths
+Imports the app with metrics on, then swaps the instrumentation (timed wrappers vs. the
+original functions) in and out around every step and compares median step times
+
+Usage: python benchmarks/metrics_overhead.py --iterations 5000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ['METRICS_ENABLED'] = '1'
+from suite import app, synthetic_learner, synthetic_questions  # noqa: E402 (configures state/event log)
+
+ENGINE = app.CS_F111_AI_Engine
+TIMED_METHODS = ('select_optimal_question', 'generate_feedback', '_build_insights')
+INSTRUMENTED = {name: ENGINE.__dict__[name] for name in TIMED_METHODS}
+INSTRUMENTED_WSGI = app.app.wsgi_app
+
+
+def set_instrumented(enabled):
+    for name, method in INSTRUMENTED.items():
+        setattr(ENGINE, name, method if enabled else method.__wrapped__)
+    app.app.wsgi_app = INSTRUMENTED_WSGI if enabled else INSTRUMENTED_WSGI.__wrapped__
+    app.metrics.enabled = enabled
+
+
+def http_step(client, headers, ids, rng):
+    def step(i):
+        h = headers[i % 64]
+        client.get('/api/question', headers=h)
+        client.post('/api/answer', headers=h, json={
+            'question_id': ids[rng.randrange(len(ids))], 'answer': rng.randrange(4), 'time_taken': rng.uniform(3, 40)
+        })
+        if i % 4 == 0:
+            client.get('/api/insights', headers=h)
+    return step
+
+
+def engine_step(learners, bank, events):
+    def step(i):
+        engine = learners[i % 64]
+        engine.select_optimal_question(bank)
+        engine.analyze_performance(*events[i % 1024])
+        engine.get_performance_insights()
+    return step
+
+
+def interleaved(step, iterations):
+    """
+    Run each iteration once with instrumentation off and once on (order alternating)
+    so machine noise lasting longer than one step hits both sides equally
+    """
+    timings = {False: [], True: []}
+    clock = time.perf_counter
+    for i in range(iterations):
+        for enabled in ((False, True) if i % 2 else (True, False)):
+            set_instrumented(enabled)
+            start = clock()
+            step(i)
+            timings[enabled].append(clock() - start)
+    set_instrumented(True)
+    off, on = sorted(timings[False]), sorted(timings[True])
+    median_off, median_on = off[len(off) // 2], on[len(on) // 2]
+    return {
+        'iterations': iterations,
+        'off_median_us': round(median_off * 1e6, 2),
+        'on_median_us': round(median_on * 1e6, 2),
+        'overhead_pct': round((median_on / median_off - 1) * 100, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure instrumentation overhead')
+    parser.add_argument('--iterations', type=int, default=5000, help='question/answer steps per mode')
+    parser.add_argument('--bank-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bank = app.QuestionBank(synthetic_questions(args.bank_size, args.seed))
+    app.question_bank = bank
+    client = app.app.test_client()
+    headers = [{'X-Learner-Id': f'overhead-{i}'} for i in range(64)]
+    ids = [q['id'] for q in bank.questions[:1024]]
+    learners = [synthetic_learner(rng) for _ in range(64)]
+    events = [
+        (rng.random() < 0.55, rng.randint(1, 5), rng.uniform(3, 40), rng.choice(ENGINE.TOPICS))
+        for _ in range(1024)
+    ]
+
+    step = http_step(client, headers, ids, rng)
+    for i in range(200):  # Warm up
+        step(i)
+    report = {
+        'http': interleaved(step, args.iterations),
+        'engine': interleaved(engine_step(learners, bank, events), args.iterations * 10)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Multi-process load test for shared learner state
+Runs N worker processes against one SQLite state file (LEARNER_STATE_SHARED=1),
+reports answers/s per worker count and checks that no update was lost
+
+Scaling is relative to one worker and can only be linear up to the number of CPUs;
+rows with more workers than CPUs are marked with '*' (they measure contention, not scaling)
+
+Usage: python benchmarks/multiprocess_load.py --workers 1 2 4 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Never touch the repo's own learner_state.db / answer_events.jsonl (workers point the
+# state DB at a temp dir; the parent only needs the engine class)
+os.environ['LEARNER_STATE_BACKEND'] = 'memory'
+os.environ['ANSWER_EVENT_LOG'] = 'none'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker(db_path, worker_id, learners, duration, start_at, results):
+    os.environ['LEARNER_STATE_BACKEND'] = 'sqlite'
+    os.environ['LEARNER_STATE_DB'] = db_path
+    os.environ['LEARNER_STATE_SHARED'] = '1'
+    sys.path.insert(0, ROOT)
+    import app
+
+    client = app.app.test_client()
+    question_ids = [q['id'] for q in app.get_question_bank()]
+    rng = random.Random(worker_id)
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    sent = 0
+    deadline = start_at + duration
+    while time.time() < deadline:
+        response = client.post('/api/answer', json={
+            'learner_id': f'learner-{rng.randrange(learners)}',
+            'question_id': rng.choice(question_ids),
+            'answer': rng.randrange(4),
+            'time_taken': rng.uniform(3, 40)
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/answer failed: {response.status_code}')
+        sent += 1
+    results.put(sent)
+
+
+def run(workers, learners, duration):
+    """Run one load level and return (answers, answers/s, answers recorded)"""
+    sys.path.insert(0, ROOT)
+    from persistence import SQLiteStateBackend
+    import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'learner_state.db')
+        SQLiteStateBackend(db_path).close()
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        start_at = time.time() + 2.0  # Let every process finish importing
+        procs = [
+            ctx.Process(target=_worker, args=(db_path, i, learners, duration, start_at, results))
+            for i in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        sent = sum(results.get() for _ in procs)
+        for p in procs:
+            p.join()
+
+        # Every answer must be reflected exactly once in the stored state
+        backend = SQLiteStateBackend(db_path)
+        rows = backend._connect().execute('SELECT state FROM learner_state').fetchall()
+        recorded = sum(app.CS_F111_AI_Engine.deserialize(row[0]).questions_answered for row in rows)
+        backend.close()
+
+    return sent, sent / duration, recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--learners', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    baseline = None
+    print(f"{cpus} CPUs")
+    print(f"{'workers':>8} {'answers':>9} {'answers/s':>10} {'scaling':>8} {'lost':>6}")
+    for workers in args.workers:
+        sent, rate, recorded = run(workers, args.learners, args.duration)
+        baseline = baseline or rate / workers
+        mark = '*' if workers > cpus else ' '
+        print(f"{workers:>7}{mark} {sent:>9} {rate:>10.0f} {rate / baseline:>7.2f}x {sent - recorded:>6}")
+
+
+if __name__ == '__main__':
+    main()
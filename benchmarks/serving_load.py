@@ -0,0 +1,157 @@
+"""
+Load test comparing the WSGI (gunicorn + Flask) and ASGI (uvicorn + asgi.py) serving paths
+Opens many concurrent keep-alive connections; each plays a learner doing
+GET /api/question followed by POST /api/answer
+
+Usage: python benchmarks/serving_load.py --connections 1000 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'wsgi': lambda port, args: [
+        sys.executable, '-m', 'gunicorn', '--worker-class', 'gthread', '--threads', str(args.threads),
+        '--workers', '1', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'
+    ],
+    'asgi': lambda port, args: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', '1',
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log'
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def request(reader, writer, method, path, learner_id, body=None):
+    """Send one HTTP/1.1 keep-alive request and return (status, parsed JSON body)"""
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = (
+        f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nX-Learner-Id: {learner_id}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n'
+    )
+    writer.write(head.encode() + payload)
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+
+async def learner(port, learner_id, deadline, latencies, errors):
+    reader = writer = None
+    rng = random.Random(learner_id)
+    while time.time() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            start = time.perf_counter()
+            status, data = await request(reader, writer, 'GET', '/api/question', learner_id)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+                continue
+
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', '/api/answer', learner_id, {
+                'question_id': data['question']['id'],
+                'answer': rng.randrange(4),
+                'time_taken': rng.uniform(3, 40)
+            })
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, connections, duration):
+    latencies, errors = [], []
+    deadline = time.time() + duration
+    await asyncio.gather(*(
+        learner(port, f'load-{i}', deadline, latencies, errors) for i in range(connections)
+    ))
+    return latencies, errors
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(mode, args):
+    port = free_port()
+    env = dict(os.environ, LEARNER_STATE_BACKEND=args.state_backend, ANSWER_EVENT_LOG='none')
+    server = subprocess.Popen(SERVERS[mode](port, args), cwd=ROOT, env=env)
+    try:
+        wait_for_port(port)
+        latencies, errors = asyncio.run(drive(port, args.connections, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'mode': mode,
+        'connections': args.connections,
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'errors': len(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI serving under concurrent load')
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=sorted(SERVERS))
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn gthread threads (WSGI)')
+    parser.add_argument('--state-backend', default='memory')
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Startup cost of the app: import time and time-to-first-request
+Each measurement runs in a fresh interpreter against a synthetic question bank:
+  cold    import app, then serve GET /api/question (the bank is built on that request)
+  fork    a master imports app (optionally preload()), then forks workers the way
+          gunicorn does; reports each worker's time to first response and its private
+          (unshared) memory, which is what every extra worker costs
+
+Usage: python benchmarks/startup.py --sizes 1000 100000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+START = time.perf_counter()
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def private_memory_kb():
+    """Private_Dirty and Pss of this process in KiB (Linux), or None"""
+    try:
+        with open('/proc/self/smaps_rollup') as fp:
+            fields = dict(line.split(':', 1) for line in fp if ':' in line)
+    except OSError:
+        return None
+    return {name: int(fields[name].split()[0]) for name in ('Private_Dirty', 'Pss') if name in fields}
+
+
+def first_request(app):
+    response = app.app.test_client().get('/api/question', headers={'X-Learner-Id': 'startup'})
+    if response.status_code != 200:
+        raise RuntimeError(f'/api/question failed: {response.status_code}')
+
+
+def child_cold():
+    before = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    first_request(app)
+    done = time.perf_counter()
+    return {
+        'interpreter_ms': (before - START) * 1e3,
+        'import_ms': (imported - before) * 1e3,
+        'first_request_ms': (done - imported) * 1e3,
+        'time_to_first_request_ms': (done - START) * 1e3
+    }
+
+
+def child_fork(preload, workers):
+    before = time.perf_counter()
+    import app
+    if preload:
+        app.preload()
+    ready = time.perf_counter()
+
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            first_request(app)
+            report = {'first_request_ms': (time.perf_counter() - forked) * 1e3, 'memory_kb': private_memory_kb()}
+            os.write(write_fd, json.dumps(report).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as fp:
+            results.append(json.loads(fp.read()))
+        os.waitpid(pid, 0)
+
+    return {
+        'master_ms': (ready - before) * 1e3,
+        'worker_first_request_ms': statistics.median(r['first_request_ms'] for r in results),
+        'worker_private_dirty_kb': statistics.median(
+            r['memory_kb']['Private_Dirty'] for r in results) if results[0]['memory_kb'] else None
+    }
+
+
+def run_child(mode, bank_path, extra=()):
+    env = dict(os.environ, QUESTION_BANK_PATH=bank_path, LEARNER_STATE_BACKEND='memory', ANSWER_EVENT_LOG='none')
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', mode, *extra], env=env)
+    return json.loads(output)
+
+
+def write_bank(directory, size, seed):
+    from suite import synthetic_questions  # Imports the app; only the parent does this
+    path = os.path.join(directory, f'bank-{size}.json')
+    with open(path, 'w') as fp:
+        json.dump(list(synthetic_questions(size, seed)), fp)
+    return path
+
+
+def median_report(runs):
+    return {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0] if runs[0][key] is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app startup and time-to-first-request')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--workers', type=int, default=4, help='forked workers per fork run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--preload', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        report = child_cold() if args.child == 'cold' else child_fork(args.preload, args.workers)
+        print(json.dumps(report))
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            bank_path = write_bank(tmp, size, args.seed)
+            run_child('cold', bank_path)  # Writes the binary bank cache, as a warm restart would find it
+            fork_args = ('--workers', str(args.workers))
+            results.append(dict(median_report([run_child('cold', bank_path) for _ in range(args.repeat)]),
+                                name='cold', bank_size=size))
+            results.append(dict(median_report([run_child('fork', bank_path, fork_args) for _ in range(args.repeat)]),
+                                name='fork (lazy bank)', bank_size=size))
+            results.append(dict(median_report([run_child('fork', bank_path, fork_args + ('--preload',))
+                                               for _ in range(args.repeat)]),
+                                name='fork (preload)', bank_size=size))
+
+    for r in results:
+        metrics = '  '.join(f'{k} {v}' for k, v in r.items() if k not in ('name', 'bank_size'))
+        print(f"{r['name']:<18} {r['bank_size']:>8}  {metrics}")
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark suite for the engine and HTTP hot paths
+Synthetic question banks (1k-1M questions) and synthetic learners; reports latency
+percentiles, throughput and peak bytes allocated per op, and stores results as JSON
+
+Usage:
+    python benchmarks/suite.py --sizes 1000 100000 --output bench.json
+    python benchmarks/suite.py --output new.json --compare bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ['LEARNER_STATE_BACKEND'] = 'memory'
+os.environ['ANSWER_EVENT_LOG'] = 'none'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+from app import CS_F111_AI_Engine, QuestionBank
+
+CODE_SNIPPET = "```c\n#include <stdio.h>\nint main()\n{\n    int x = 5;\n    printf(\"%d\", x++ + ++x);\n    return 0;\n}\n```"
+
+
+def synthetic_questions(size, seed=0):
+    """Question dicts shaped like sample_questions.json"""
+    rng = random.Random(seed)
+    topics = CS_F111_AI_Engine.TOPICS
+    for i in range(1, size + 1):
+        yield {
+            'id': i,
+            'question': f"Q{i}: what is the output of this program?\n\n{CODE_SNIPPET}",
+            'options': ['5', '6', '11', 'Undefined behaviour'],
+            'correct': rng.randrange(4),
+            'topic': topics[rng.randrange(len(topics))],
+            'difficulty': rng.randint(1, 5),
+            'explanation': 'Modifying x twice without a sequence point is undefined behaviour.',
+            'exam_type': 'Quiz',
+            'marks': 2,
+            'time_estimate': 90
+        }
+
+
+def synthetic_learner(rng, answers=20):
+    """Engine that has answered some random questions (so weak topics exist)"""
+    engine = CS_F111_AI_Engine()
+    for _ in range(answers):
+        engine.analyze_performance(
+            rng.random() < 0.55, rng.randint(1, 5), rng.uniform(3, 40), rng.choice(CS_F111_AI_Engine.TOPICS)
+        )
+    return engine
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def measure(name, op, ops, bank_size=None, alloc_samples=200):
+    """Time ops calls of op(i) individually, then sample per-op allocation peaks"""
+    for i in range(min(ops, 100)):  # Warm up
+        op(i)
+
+    gc.collect()
+    timings = []
+    clock = time.perf_counter
+    start = clock()
+    for i in range(ops):
+        t0 = clock()
+        op(i)
+        timings.append(clock() - t0)
+    elapsed = clock() - start
+
+    tracemalloc.start()
+    peaks = []
+    for i in range(min(ops, alloc_samples)):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        op(i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'name': name,
+        'bank_size': bank_size,
+        'ops': ops,
+        'ops_per_sec': round(ops / elapsed, 1),
+        'mean_us': round(elapsed / ops * 1e6, 2),
+        'p50_us': round(percentile(timings, 50) * 1e6, 2),
+        'p95_us': round(percentile(timings, 95) * 1e6, 2),
+        'p99_us': round(percentile(timings, 99) * 1e6, 2),
+        'alloc_peak_bytes': round(sum(peaks) / len(peaks)) if peaks else 0
+    }
+
+
+def bench_engine(bank, size, ops, rng):
+    learners = [synthetic_learner(rng) for _ in range(64)]
+    events = [
+        (rng.random() < 0.55, rng.randint(1, 5), rng.uniform(3, 40), rng.choice(CS_F111_AI_Engine.TOPICS))
+        for _ in range(1024)
+    ]
+    results = [
+        measure('engine.select_optimal_question',
+                lambda i: learners[i % 64].select_optimal_question(bank), ops, size),
+        measure('engine.analyze_performance',
+                lambda i: learners[i % 64].analyze_performance(*events[i % 1024]), ops, size),
+        measure('engine.get_performance_insights (cached)',
+                lambda i: learners[i % 64].get_performance_insights(), ops, size),
+    ]
+
+    def dirty_insights(i):
+        engine = learners[i % 64]
+        engine._insights = None
+        engine.get_performance_insights()
+    results.append(measure('engine.get_performance_insights (rebuild)', dirty_insights, ops, size))
+    return results
+
+
+def bench_http(bank, size, ops, rng):
+    app.question_bank = bank
+    client = app.app.test_client()
+    ids = [q['id'] for q in bank.questions[:1024]]
+    headers = [{'X-Learner-Id': f'bench-{i}'} for i in range(64)]
+    answers = [
+        {'question_id': ids[rng.randrange(len(ids))], 'answer': rng.randrange(4), 'time_taken': rng.uniform(3, 40)}
+        for _ in range(1024)
+    ]
+    return [
+        measure('http GET /api/question',
+                lambda i: client.get('/api/question', headers=headers[i % 64]), ops, size),
+        measure('http POST /api/answer',
+                lambda i: client.post('/api/answer', json=answers[i % 1024], headers=headers[i % 64]), ops, size),
+        measure('http GET /api/insights',
+                lambda i: client.get('/api/insights', headers=headers[i % 64]), ops, size),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50 / throughput changes against a baseline run; return regressions"""
+    with open(baseline_path) as fp:
+        baseline = {(r['name'], r['bank_size']): r for r in json.load(fp)['results']}
+    regressions = []
+    print(f"\n{'benchmark':<48} {'size':>8} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for result in results:
+        before = baseline.get((result['name'], result['bank_size']))
+        if before is None:
+            continue
+        change = (result['p50_us'] - before['p50_us']) / before['p50_us'] * 100 if before['p50_us'] else 0
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{result['name']:<48} {result['bank_size']:>8} {before['p50_us']:>11} {result['p50_us']:>10} {change:>+7.1f}%{flag}")
+        if flag:
+            regressions.append(result['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the CS F111 AI engine and HTTP routes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--ops', type=int, default=5000, help='operations per engine benchmark')
+    parser.add_argument('--http-ops', type=int, default=1000, help='requests per HTTP benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='p50 regression threshold in percent')
+    args = parser.parse_args()
+
+    random.seed(args.seed)  # Engines built here take their stream seeds from the global RNG
+    app.RANDOM_SEED = args.seed  # Learners created by HTTP requests are seeded per learner id
+    results = []
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        bank = QuestionBank(synthetic_questions(size, args.seed))
+        build_seconds = time.perf_counter() - start
+        results.append({'name': 'bank.build', 'bank_size': size, 'ops': 1,
+                        'ops_per_sec': round(1 / build_seconds, 3), 'mean_us': round(build_seconds * 1e6, 2),
+                        'p50_us': round(build_seconds * 1e6, 2), 'p95_us': round(build_seconds * 1e6, 2),
+                        'p99_us': round(build_seconds * 1e6, 2), 'alloc_peak_bytes': None})
+        results.extend(bench_engine(bank, size, args.ops, rng))
+        if not args.skip_http:
+            results.extend(bench_http(bank, size, args.http_ops, rng))
+        del bank
+        gc.collect()
+
+    for r in results:
+        print(f"{r['name']:<48} {r['bank_size']:>8}  p50 {r['p50_us']:>10.2f}us  p99 {r['p99_us']:>10.2f}us  "
+              f"{r['ops_per_sec']:>11.1f} ops/s  {r['alloc_peak_bytes'] or 0:>8} B/op")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'sizes': args.sizes
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
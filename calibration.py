@@ -0,0 +1,420 @@
+"""
+Item response theory calibration of question difficulty and learner ability
+Elo-style 1PL model, P(correct) = sigmoid(ability - difficulty), fitted from answer
+logs with vectorized NumPy batch updates and kept up to date as answers arrive.
+DifficultyIndex answers nearest-difficulty lookups in O(log n) for question selection
+
+Usage:
+    python calibration.py answer_events.jsonl --questions sample_questions.json --output calibration.npz
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import numpy as np
+
+from event_log import iter_event_chunks
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still atomic, just not serialized across processes
+    fcntl = None
+
+PRIOR_SCALE = 0.75  # Logits per hand-set difficulty level; level 3 is 0
+
+
+def prior_difficulty(level):
+    """Starting difficulty (logits) for a question's hand-set 1-5 level"""
+    return (level - 3) * PRIOR_SCALE
+
+
+def target_difficulty(ability, success_rate):
+    """Difficulty a learner of this ability answers correctly with probability success_rate"""
+    return ability - math.log(success_rate / (1 - success_rate))
+
+
+class DifficultyIndex:
+    """
+    Questions sorted by calibrated difficulty, overall and per topic
+    Immutable snapshot; Calibrator swaps in a new one as difficulties move
+    """
+    def __init__(self, questions, difficulties):
+        order = np.argsort(difficulties, kind='stable')
+        self._all = (array('d', difficulties[order]), tuple(questions[i] for i in order))
+
+        by_topic = {}
+        for i in order:
+            by_topic.setdefault(questions[i].get('topic', 'General'), []).append(i)
+        self._by_topic = {
+            topic: (array('d', difficulties[rows]), tuple(questions[i] for i in rows))
+            for topic, rows in by_topic.items()
+        }
+
+    def __len__(self):
+        return len(self._all[1])
+
+    def nearest(self, target, k=8, topic=None):
+        """Up to k questions whose difficulty is closest to target (binary search, then expand)"""
+        difficulties, questions = self._all if topic is None else self._by_topic.get(topic, ((), ()))
+        n = len(questions)
+        hi = bisect_left(difficulties, target)
+        lo = hi - 1
+        nearest = []
+        while len(nearest) < k and (lo >= 0 or hi < n):
+            if hi >= n or (lo >= 0 and target - difficulties[lo] <= difficulties[hi] - target):
+                nearest.append(questions[lo])
+                lo -= 1
+            else:
+                nearest.append(questions[hi])
+                hi += 1
+        return nearest
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock across processes (e.g. gunicorn workers saving at exit)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as fp:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def _merge_estimates(file_value, file_information, base_value, base_information, value, information):
+    """
+    Add this process's evidence since base onto the saved estimates (all arrays aligned)
+    Estimates are information-weighted, so the evidence added is (information - base)
+    carrying (value * information - base value * base information)
+    """
+    merged_information = file_information + (information - base_information)
+    weighted = file_value * file_information + (value * information - base_value * base_information)
+    return weighted / merged_information, merged_information
+
+
+def _newton_steps(index, gradient, information):
+    """Per-unique-index gradient and information sums for a batch (O(batch), not O(bank))"""
+    unique, inverse = np.unique(index, return_inverse=True)
+    return (unique, np.bincount(inverse, weights=gradient, minlength=len(unique)),
+            np.bincount(inverse, weights=information, minlength=len(unique)))
+
+
+class Calibrator:
+    """
+    Online 1PL calibration over a question bank
+    Each batch takes one Newton step per item / learner on the log-likelihood; the
+    Fisher information gathered so far (plus a prior) damps the step, Elo/Glicko-style,
+    so estimates settle as evidence accumulates and repeats within a batch cannot overshoot
+    """
+    def __init__(self, questions, prior_precision=1.0, batch_size=256, reindex_every=2000, capacity=1024):
+        self.questions = tuple(questions)
+        self.question_index = {q['id']: i for i, q in enumerate(self.questions)}
+        self.difficulty = np.array([prior_difficulty(q.get('difficulty', 3)) for q in self.questions], dtype=np.float64)
+        self.item_information = np.full(len(self.questions), prior_precision)
+        self.item_answers = np.zeros(len(self.questions), dtype=np.int64)
+
+        self.learner_ids = []
+        self.learner_index = {}
+        self.ability = np.zeros(capacity, dtype=np.float64)
+        self.learner_information = np.full(capacity, prior_precision)
+        self.learner_answers = np.zeros(capacity, dtype=np.int64)
+
+        self.prior_precision = prior_precision
+        self.batch_size = batch_size
+        self.reindex_every = reindex_every
+
+        self.index = DifficultyIndex(self.questions, self.difficulty)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._since_reindex = 0
+        self._reindexing = False
+
+        # Counters
+        self.updates = 0
+        self.reindexes = 0
+        self._mark_saved()
+
+    def _rows_for(self, learner_ids):
+        """
+        Map learner ids to ability rows, adding unseen learners
+        ability_of() reads without the lock, so a new row is published in learner_index
+        only once the arrays have grown to hold it
+        """
+        rows = np.empty(len(learner_ids), dtype=np.int64)
+        index = self.learner_index
+        for i, learner_id in enumerate(learner_ids):
+            row = index.get(learner_id)
+            if row is None:
+                row = len(self.learner_ids)
+                if row == len(self.ability):
+                    self.learner_information = np.concatenate([self.learner_information, np.full(row, self.prior_precision)])
+                    self.learner_answers = np.concatenate([self.learner_answers, np.zeros(row, dtype=np.int64)])
+                    self.ability = np.concatenate([self.ability, np.zeros(row)])
+                self.learner_ids.append(learner_id)
+                index[learner_id] = row
+            rows[i] = row
+        return rows
+
+    def update(self, learner_ids, question_ids, correct):
+        """
+        Apply a batch of answers given as parallel sequences; returns the summed log-loss
+        of the pre-update predictions (answers to unknown questions are skipped)
+        Every prediction in the batch uses the parameters from before the batch
+        """
+        cols = np.fromiter((self.question_index.get(q, -1) for q in question_ids), dtype=np.int64, count=len(question_ids))
+        known = cols >= 0
+        if not known.any():
+            return 0.0
+        rows = self._rows_for([learner_id for learner_id, k in zip(learner_ids, known) if k])
+        cols = cols[known]
+        outcome = np.asarray(correct, dtype=np.float64)[known]
+
+        p = 1.0 / (1.0 + np.exp(self.difficulty[cols] - self.ability[rows]))
+        residual = outcome - p
+        information = p * (1.0 - p)
+
+        learners, gradient, info = _newton_steps(rows, residual, information)
+        self.learner_information[learners] += info
+        self.ability[learners] += gradient / self.learner_information[learners]
+        self.learner_answers[learners] += np.bincount(np.searchsorted(learners, rows), minlength=len(learners))
+
+        items, gradient, info = _newton_steps(cols, residual, information)
+        self.item_information[items] += info
+        self.difficulty[items] -= gradient / self.item_information[items]
+        self.item_answers[items] += np.bincount(np.searchsorted(items, cols), minlength=len(items))
+        self.updates += len(rows)
+
+        p = np.clip(p, 1e-9, 1 - 1e-9)
+        return float(-(outcome * np.log(p) + (1 - outcome) * np.log(1 - p)).sum())
+
+    def fit(self, paths, epochs=1, chunk_size=10000, course=None, default_course=None):
+        """
+        Fit from answer event logs; returns the mean log-loss per epoch
+        Logs hold every course's answers, so pass course to fit only the one this bank is for
+        (events without a course field belong to default_course)
+        """
+        losses = []
+        for _ in range(epochs):
+            loss = events = 0
+            for path in paths:
+                for chunk in iter_event_chunks(path, chunk_size, course, default_course):
+                    loss += self.update([e['learner'] for e in chunk], [e['qid'] for e in chunk],
+                                        [bool(e['correct']) for e in chunk])
+                    events += len(chunk)
+            losses.append(loss / events if events else 0.0)
+        self.reindex()
+        return losses
+
+    def observe(self, learner_id, question_id, correct):
+        """Queue one live answer; applied as a batch once batch_size are queued"""
+        with self._lock:
+            self._pending.append((learner_id, question_id, correct))
+            if len(self._pending) < self.batch_size:
+                return
+            self._apply_pending()
+
+    def flush(self):
+        with self._lock:
+            self._apply_pending()
+
+    def _apply_pending(self):
+        if not self._pending:
+            return
+        learner_ids, question_ids, correct = zip(*self._pending)
+        self._pending = []
+        self.update(learner_ids, question_ids, correct)
+
+        # Re-sort off the request thread; readers keep the previous snapshot meanwhile
+        self._since_reindex += len(learner_ids)
+        if self._since_reindex >= self.reindex_every and not self._reindexing:
+            self._since_reindex = 0
+            self._reindexing = True
+            threading.Thread(target=self.reindex, name='difficulty-reindex', daemon=True).start()
+
+    def reindex(self):
+        """Rebuild the difficulty index from the current estimates"""
+        try:
+            self.index = DifficultyIndex(self.questions, self.difficulty.copy())
+            self.reindexes += 1
+        finally:
+            self._reindexing = False
+
+    def ability_of(self, learner_id):
+        """Current ability estimate (logits); 0 for learners with no answers yet"""
+        row = self.learner_index.get(learner_id)
+        return float(self.ability[row]) if row is not None else 0.0
+
+    def difficulty_of(self, question_id):
+        i = self.question_index.get(question_id)
+        return float(self.difficulty[i]) if i is not None else None
+
+    def _mark_saved(self):
+        """Remember the estimates as loaded / saved; later saves merge only what changed since"""
+        learners = len(self.learner_ids)
+        self._saved_updates = self.updates
+        self._base_items = (self.difficulty.copy(), self.item_information.copy(), self.item_answers.copy())
+        self._base_learners = (self.ability[:learners].copy(), self.learner_information[:learners].copy(),
+                               self.learner_answers[:learners].copy())
+
+    def _base_learner_arrays(self):
+        """Baseline per learner row; learners added since are at the prior"""
+        learners = len(self.learner_ids)
+        ability, information, answers = self._base_learners
+        extra = learners - len(ability)
+        return (np.concatenate([ability, np.zeros(extra)]),
+                np.concatenate([information, np.full(extra, self.prior_precision)]),
+                np.concatenate([answers, np.zeros(extra, dtype=np.int64)]))
+
+    def save(self, path, merge=True):
+        """
+        Write estimates to an .npz file (keyed by question / learner id)
+        With merge=True the evidence gathered since this calibrator was loaded / last saved is
+        added onto whatever the file holds now, so several workers that warm-started from the
+        same file and saved at exit all contribute. The file is replaced atomically, under a
+        lock, and not at all when nothing changed
+        """
+        with self._lock:
+            self._apply_pending()
+            if merge and self.updates == self._saved_updates:
+                return
+            with _file_lock(path + '.lock'):
+                items = (self.difficulty, self.item_information, self.item_answers)
+                learner_ids = list(self.learner_ids)
+                learners = len(learner_ids)
+                ability = self.ability[:learners]
+                learner_information = self.learner_information[:learners]
+                learner_answers = self.learner_answers[:learners]
+                if merge and os.path.exists(path):
+                    items, learner_ids, (ability, learner_information, learner_answers) = self._merged_with(path)
+
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as fp:
+                    np.savez(
+                        fp,
+                        question_ids=np.array([json.dumps(q['id']) for q in self.questions], dtype=str),
+                        difficulty=items[0], item_information=items[1], item_answers=items[2],
+                        learner_ids=np.array([json.dumps(l) for l in learner_ids], dtype=str),
+                        ability=ability, learner_information=learner_information, learner_answers=learner_answers
+                    )
+                os.replace(tmp_path, path)
+            self._mark_saved()
+
+    def _merged_with(self, path):
+        """Saved estimates plus this process's evidence since its baseline"""
+        base_difficulty, base_item_information, base_item_answers = self._base_items
+        # Items missing from the file start from this process's baseline
+        file_difficulty, file_item_information, file_item_answers = (
+            base_difficulty.copy(), base_item_information.copy(), base_item_answers.copy())
+        with np.load(path) as data:
+            for qid, difficulty, information, answers in zip(
+                    data['question_ids'], data['difficulty'], data['item_information'], data['item_answers']):
+                i = self.question_index.get(json.loads(str(qid)))
+                if i is not None:
+                    file_difficulty[i], file_item_information[i], file_item_answers[i] = difficulty, information, answers
+            saved_ids = [json.loads(str(l)) for l in data['learner_ids']]
+            saved = (np.array(data['ability']), np.array(data['learner_information']), np.array(data['learner_answers']))
+
+        difficulty, item_information = _merge_estimates(
+            file_difficulty, file_item_information, base_difficulty, base_item_information,
+            self.difficulty, self.item_information)
+        item_answers = file_item_answers + (self.item_answers - base_item_answers)
+
+        # Learners: saved rows first, then learners only this process has seen
+        learner_ids = list(saved_ids)
+        saved_index = {learner_id: row for row, learner_id in enumerate(saved_ids)}
+        rows = []
+        for learner_id in self.learner_ids:
+            row = saved_index.get(learner_id)
+            if row is None:
+                row = saved_index[learner_id] = len(learner_ids)
+                learner_ids.append(learner_id)
+            rows.append(row)
+        rows = np.array(rows, dtype=np.int64)
+        extra = len(learner_ids) - len(saved_ids)
+        ability = np.concatenate([saved[0], np.zeros(extra)])
+        learner_information = np.concatenate([saved[1], np.full(extra, self.prior_precision)])
+        learner_answers = np.concatenate([saved[2], np.zeros(extra, dtype=np.int64)])
+
+        learners = len(self.learner_ids)
+        base_ability, base_information, base_answers = self._base_learner_arrays()
+        ability[rows], learner_information[rows] = _merge_estimates(
+            ability[rows], learner_information[rows], base_ability, base_information,
+            self.ability[:learners], self.learner_information[:learners])
+        learner_answers[rows] += self.learner_answers[:learners] - base_answers
+        return (difficulty, item_information, item_answers), learner_ids, (ability, learner_information, learner_answers)
+
+    def load(self, path):
+        """Warm start from a saved file; questions no longer in the bank are ignored"""
+        with np.load(path) as data:
+            for qid, difficulty, information, answers in zip(
+                    data['question_ids'], data['difficulty'], data['item_information'], data['item_answers']):
+                i = self.question_index.get(json.loads(str(qid)))
+                if i is not None:
+                    self.difficulty[i] = difficulty
+                    self.item_information[i] = information
+                    self.item_answers[i] = answers
+            learner_ids = [json.loads(str(l)) for l in data['learner_ids']]
+            rows = self._rows_for(learner_ids)
+            self.ability[rows] = data['ability']
+            self.learner_information[rows] = data['learner_information']
+            self.learner_answers[rows] = data['learner_answers']
+        self._mark_saved()
+        self.reindex()
+
+    def stats(self):
+        return {
+            'questions': len(self.questions),
+            'learners': len(self.learner_ids),
+            'updates': self.updates,
+            'pending': len(self._pending),
+            'reindexes': self.reindexes
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calibrate question difficulty and learner ability from answer logs')
+    parser.add_argument('logs', nargs='+', help='answer event log files (JSONL)')
+    parser.add_argument('--course', help='course whose answers to fit (default: the built-in course)')
+    parser.add_argument('--questions', help='question bank (default: the course\'s bank)')
+    parser.add_argument('--output', default='calibration.npz')
+    parser.add_argument('--warm-start', help='existing calibration file to continue from')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    os.environ['ANSWER_EVENT_LOG'] = 'none'
+    os.environ['LEARNER_STATE_BACKEND'] = 'none'
+    import app
+    course = args.course or app.DEFAULT_COURSE
+    if args.questions:
+        bank = app.load_question_bank(args.questions)
+    else:
+        resolved = app.resolve_course(course)
+        bank = resolved.bank if resolved is not None else app.get_question_bank()
+
+    calibrator = Calibrator(bank)
+    if args.warm_start:
+        calibrator.load(args.warm_start)
+    start = time.perf_counter()
+    losses = calibrator.fit(args.logs, args.epochs, args.chunk_size, course, app.DEFAULT_COURSE)
+    elapsed = time.perf_counter() - start
+    calibrator.save(args.output, merge=False)
+
+    report = dict(calibrator.stats(), log_loss=[round(loss, 4) for loss in losses], seconds=round(elapsed, 3))
+    print(json.dumps(report, indent=2))
+    print(f"Calibrated {report['questions']} questions and {report['learners']} learners "
+          f"from {report['updates']} answers in {report['seconds']}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Vectorized cohort engine for analytics and replay jobs
+Holds per-learner engine metrics as columnar NumPy arrays and applies batches of answer
+events with the same per-event semantics as analyze_performance
+
+The engine class (app.CS_F111_AI_Engine, or a course's engine class) is passed in, so
+importing this module does not import app and set up its state store and event log
+"""
+import time
+
+import numpy as np
+
+
+class CohortEngine:
+    """
+    Columnar state for many learners of one engine class
+    Rows are learners, topic columns follow engine_class.TOPICS; quiz / midsem readiness
+    use the class's QUIZ_TOPICS / MIDSEM_TOPICS
+    """
+    def __init__(self, engine_class, capacity=1024):
+        self.engine_class = engine_class
+        self.topics = tuple(engine_class.TOPICS)
+        self.topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        self.quiz_columns = np.array([self.topic_index[t] for t in engine_class.QUIZ_TOPICS if t in self.topic_index], dtype=np.int64)
+        self.midsem_columns = np.array([self.topic_index[t] for t in engine_class.MIDSEM_TOPICS if t in self.topic_index], dtype=np.int64)
+        self.quiz_divisor = len(engine_class.QUIZ_TOPICS)
+        self.midsem_divisor = len(engine_class.MIDSEM_TOPICS)
+        self.response_window = engine_class.RESPONSE_WINDOW
+
+        self.learner_ids = []
+        self.learner_index = {}
+        self.size = 0
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        """Allocate (or grow) every column to hold capacity learners"""
+        n_topics = len(self.topics)
+        defaults = self.engine_class()
+        columns = {
+            # Core learning metrics
+            'competence': (np.float64, (), defaults.competence_level),
+            'engagement': (np.float64, (), defaults.engagement_score),
+            'confidence': (np.float64, (), defaults.confidence_level),
+            # Session statistics
+            'questions_answered': (np.int64, (), 0),
+            'correct_answers': (np.int64, (), 0),
+            'current_streak': (np.int64, (), 0),
+            'max_streak': (np.int64, (), 0),
+            'total_time_spent': (np.float64, (), 0),
+            'session_start': (np.float64, (), 0),
+            # Topic matrix
+            'topic_correct': (np.int64, (n_topics,), 0),
+            'topic_total': (np.int64, (n_topics,), 0),
+            'topic_mastery': (np.int64, (n_topics,), 0),
+            'weak': (np.bool_, (n_topics,), False),
+            'strong': (np.bool_, (n_topics,), False),
+            # Learning patterns and response analytics
+            'preferred_difficulty': (np.float64, (), defaults.preferred_difficulty),
+            'avg_response_time': (np.float64, (), defaults.avg_response_time),
+            'response_times': (np.float64, (self.response_window,), 0),
+            'response_count': (np.int64, (), 0),
+            'response_pos': (np.int64, (), 0),
+            # Exam readiness
+            'quiz_readiness': (np.float64, (), 0),
+            'midsem_readiness': (np.float64, (), 0),
+            'endsem_readiness': (np.float64, (), 0),
+        }
+        for name, (dtype, shape, fill) in columns.items():
+            column = np.full((capacity,) + shape, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                column[:len(old)] = old
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.size
+
+    def rows_for(self, learner_ids):
+        """Map learner ids to row indices, adding unseen learners"""
+        rows = np.empty(len(learner_ids), dtype=np.int64)
+        index = self.learner_index
+        now = time.time()
+        for i, learner_id in enumerate(learner_ids):
+            row = index.get(learner_id)
+            if row is None:
+                if self.size == self.capacity:
+                    self._allocate(self.capacity * 2)
+                row = index[learner_id] = self.size
+                self.learner_ids.append(learner_id)
+                self.session_start[row] = now
+                self.size += 1
+            rows[i] = row
+        return rows
+
+    def apply_events(self, learner_ids, topics, difficulties, correct, time_taken):
+        """
+        Apply a batch of answer events given as parallel sequences
+        Events for the same learner are applied in the order given
+        """
+        rows = self.rows_for(learner_ids)
+        topic_index = self.topic_index
+        topic_cols = np.fromiter((topic_index.get(t, -1) for t in topics), dtype=np.int64, count=len(rows))
+        self.apply_batch(rows, topic_cols, difficulties, correct, time_taken)
+
+    def apply_batch(self, rows, topic_cols, difficulties, correct, time_taken):
+        """
+        Vectorized core: rows/topic_cols are int arrays (topic -1 = unknown topic)
+        The batch is split into rounds holding at most one event per learner,
+        so every round is a set of independent column updates
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        topic_cols = np.asarray(topic_cols, dtype=np.int64)
+        difficulties = np.asarray(difficulties, dtype=np.float64)
+        correct = np.asarray(correct, dtype=np.bool_)
+        time_taken = np.asarray(time_taken, dtype=np.float64)
+
+        # Rank of each event among its learner's events in this batch
+        order = np.argsort(rows, kind='stable')
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        group_sizes = np.diff(np.r_[starts, len(rows)])
+        rank = np.empty(len(rows), dtype=np.int64)
+        rank[order] = np.arange(len(rows)) - np.repeat(starts, group_sizes)
+
+        by_round = np.argsort(rank, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            sel = by_round[start:end]
+            self._apply_round(rows[sel], topic_cols[sel], difficulties[sel], correct[sel], time_taken[sel])
+
+    def _apply_round(self, li, ti, d, c, t):
+        """Apply one event per learner (li unique), mirroring analyze_performance"""
+        # Update basic session stats
+        self.questions_answered[li] += 1
+        self.total_time_spent[li] += t
+
+        # Response time ring buffer; sum oldest-first like the engine's list
+        pos = self.response_pos[li]
+        self.response_times[li, pos] = t
+        pos = (pos + 1) % self.response_window
+        self.response_pos[li] = pos
+        count = np.minimum(self.response_count[li] + 1, self.response_window)
+        self.response_count[li] = count
+        window = self.response_times[li]
+        total = np.zeros(len(li))
+        for k in range(self.response_window):
+            total += window[np.arange(len(li)), (pos + k) % self.response_window]
+        avg = total / count
+        self.avg_response_time[li] = avg
+
+        # Update topic-specific performance
+        known = ti >= 0
+        lk, tk = li[known], ti[known]
+        self.topic_total[lk, tk] += 1
+        self.topic_correct[lk, tk] += c[known]
+        topic_total = self.topic_total[lk, tk]
+        accuracy = self.topic_correct[lk, tk] / topic_total
+        practice_factor = np.minimum(1.0, topic_total / 5.0)
+        self.topic_mastery[lk, tk] = np.trunc(accuracy * practice_factor * 100)
+
+        mastery = np.zeros(len(li), dtype=np.int64)
+        mastery[known] = self.topic_mastery[lk, tk]
+
+        # Streaks
+        streak = np.where(c, self.current_streak[li] + 1, 0)
+        self.current_streak[li] = streak
+        self.max_streak[li] = np.maximum(self.max_streak[li], streak)
+        self.correct_answers[li] += c
+
+        # Competence: gain on correct (bonus when quick), loss on incorrect
+        gain = 3 + d * 2
+        gain = np.where(t < avg * 0.7, gain * 1.5, gain)
+        loss = np.maximum(3, 10 - d)
+        competence = self.competence[li]
+        competence = np.where(c, np.minimum(100, competence + gain), np.maximum(0, competence - loss))
+        self.competence[li] = competence
+
+        # Strong / weak topics
+        make_strong = c & known & (mastery > 70)
+        make_weak = ~c & known & (mastery < 40)
+        self.strong[li[make_strong], ti[make_strong]] = True
+        self.weak[li[make_strong], ti[make_strong]] = False
+        self.weak[li[make_weak], ti[make_weak]] = True
+        self.strong[li[make_weak], ti[make_weak]] = False
+
+        # Confidence
+        confidence = self.confidence[li]
+        self.confidence[li] = np.where(c, np.minimum(100, confidence + 2 + d), np.maximum(20, confidence - 4))
+
+        # _update_engagement
+        engagement = self.engagement[li]
+        engagement = np.where((t > 5) & (t < 12), np.minimum(100, engagement + 4),
+                              np.where(t > 30, np.maximum(30, engagement - 6), engagement))
+        engagement = np.where(c, np.minimum(100, engagement + 3), np.maximum(30, engagement - 2))
+        engagement = np.where(streak >= 3, np.minimum(100, engagement + 5), engagement)
+        self.engagement[li] = engagement
+
+        # _adjust_difficulty_preference
+        preferred = self.preferred_difficulty[li]
+        self.preferred_difficulty[li] = np.where(
+            c & (d <= preferred), np.minimum(5, preferred + 0.15),
+            np.where(~c & (d >= preferred), np.maximum(1, preferred - 0.25), preferred)
+        )
+
+        # _update_exam_readiness
+        topic_mastery = self.topic_mastery[li]
+        quiz_score = topic_mastery[:, self.quiz_columns].sum(axis=1)
+        midsem_score = topic_mastery[:, self.midsem_columns].sum(axis=1)
+        endsem_score = topic_mastery.sum(axis=1)
+        self.quiz_readiness[li] = np.minimum(100, quiz_score // self.quiz_divisor + competence * 0.3)
+        self.midsem_readiness[li] = np.minimum(100, midsem_score // self.midsem_divisor + competence * 0.2)
+        self.endsem_readiness[li] = np.minimum(100, endsem_score // len(self.topics) + competence * 0.1)
+
+    def to_state(self, learner_id):
+        """Export one learner in the engine's to_state() form"""
+        i = self.learner_index[learner_id]
+        count = int(self.response_count[i])
+        pos = int(self.response_pos[i])
+        order = [(pos - count + k) % self.response_window for k in range(count)]
+        return [
+            self.engine_class.STATE_VERSION,
+            float(self.competence[i]), float(self.engagement[i]), float(self.confidence[i]),
+            int(self.questions_answered[i]), int(self.correct_answers[i]),
+            int(self.current_streak[i]), int(self.max_streak[i]),
+            float(self.total_time_spent[i]), float(self.session_start[i]),
+            [[topic, int(self.topic_correct[i, j]), int(self.topic_total[i, j]), int(self.topic_mastery[i, j])]
+             for j, topic in enumerate(self.topics)],
+            sorted(self.topics[j] for j in np.flatnonzero(self.weak[i])),
+            sorted(self.topics[j] for j in np.flatnonzero(self.strong[i])),
+            float(self.preferred_difficulty[i]), float(self.avg_response_time[i]),
+            [float(self.response_times[i, j]) for j in order],
+            float(self.quiz_readiness[i]), float(self.midsem_readiness[i]), float(self.endsem_readiness[i]),
+            None, None  # Review cards and random streams are not tracked column-wise
+        ]
+
+    def to_engine(self, learner_id):
+        """Materialise one learner as an engine"""
+        return self.engine_class.from_state(self.to_state(learner_id))
+
+    def load_engine(self, learner_id, engine):
+        """Import an existing engine's state into the cohort"""
+        row = int(self.rows_for([learner_id])[0])
+        state = engine.to_state()
+        (_, competence, engagement, confidence, answered, correct_answers, streak, max_streak,
+         total_time, session_start, topics, weak_topics, strong_topics,
+         preferred, avg_response, response_times, quiz, midsem, endsem) = state[:19]
+
+        self.competence[row], self.engagement[row], self.confidence[row] = competence, engagement, confidence
+        self.questions_answered[row], self.correct_answers[row] = answered, correct_answers
+        self.current_streak[row], self.max_streak[row] = streak, max_streak
+        self.total_time_spent[row], self.session_start[row] = total_time, session_start
+        for topic, topic_correct, topic_total, topic_mastery in topics:
+            j = self.topic_index.get(topic)
+            if j is not None:
+                self.topic_correct[row, j] = topic_correct
+                self.topic_total[row, j] = topic_total
+                self.topic_mastery[row, j] = topic_mastery
+        self.weak[row] = [topic in weak_topics for topic in self.topics]
+        self.strong[row] = [topic in strong_topics for topic in self.topics]
+        self.preferred_difficulty[row], self.avg_response_time[row] = preferred, avg_response
+        recent = response_times[-self.response_window:]
+        self.response_times[row] = 0
+        self.response_times[row, :len(recent)] = recent
+        self.response_count[row] = len(recent)
+        self.response_pos[row] = len(recent) % self.response_window
+        self.quiz_readiness[row], self.midsem_readiness[row], self.endsem_readiness[row] = quiz, midsem, endsem
@@ -0,0 +1,317 @@
+"""
+Incremental cohort statistics for instructor views
+Kept up to date as answers arrive, so /api/cohort-insights never walks every learner:
+
+  distributions   learners' exam readiness, competence and per-topic mastery (the heatmap),
+                  as exact 0-100 histograms; each answer moves one learner between bins
+  questions       attempts and misses per question (most-missed list)
+  response times  a log-bucketed quantile sketch (bounded relative error)
+
+Statistics are kept per process. With several workers behind one port (gunicorn), set
+COHORT_STATS_DIR to a directory the workers share (gunicorn.conf.py does): each process
+exports its statistics there and /api/cohort-insights, served by any worker, merges every
+process's export (CohortExports). Statistics start empty and cover answers since startup
+"""
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+SCALE = 101                     # Scores are integers 0-100
+BAND = 10                       # Heatmap / histogram band width in score points
+PERCENTILES = (10, 25, 50, 75, 90)
+DISTRIBUTIONS = ('quiz', 'midsem', 'endsem', 'competence')
+
+
+def histogram_summary(counts, total):
+    """Mean, percentiles and learners per band (0-9, 10-19, ... 90-100) of an exact 0-100 histogram"""
+    if not total:
+        return {'mean': 0, **{f'p{p}': 0 for p in PERCENTILES}, 'bands': [0] * (100 // BAND)}
+    summary = {'mean': round(sum(score * n for score, n in enumerate(counts)) / total, 1)}
+    # Nearest-rank percentiles in one pass over the bins
+    ranks = [(p, max(1, math.ceil(p / 100 * total))) for p in PERCENTILES]
+    seen, next_rank = 0, 0
+    for score, n in enumerate(counts):
+        seen += n
+        while next_rank < len(ranks) and seen >= ranks[next_rank][1]:
+            summary[f'p{ranks[next_rank][0]}'] = score
+            next_rank += 1
+    bands = [sum(counts[low:low + BAND]) for low in range(0, 100, BAND)]
+    bands[-1] += counts[100]    # 90-100
+    summary['bands'] = bands
+    return summary
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style)
+    Positive values fall in buckets [gamma^(k-1), gamma^k); any quantile is returned within
+    relative_accuracy of the true value, in memory logarithmic in the value range
+    """
+    def __init__(self, relative_accuracy=0.02):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}   # k -> count
+        self.zeros = 0      # Values <= 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        k = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[k] = self.buckets.get(k, 0) + 1
+
+    def quantiles(self, qs):
+        """Estimates for ascending quantiles qs (0-1); None when empty"""
+        if not self.count:
+            return [None] * len(qs)
+        results = []
+        keys = sorted(self.buckets)
+        seen, i = self.zeros, 0
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self.zeros:
+                results.append(0.0)
+                continue
+            while i < len(keys) and seen + self.buckets[keys[i]] <= rank:
+                seen += self.buckets[keys[i]]
+                i += 1
+            k = keys[min(i, len(keys) - 1)]
+            results.append(2 * self.gamma ** k / (self.gamma + 1))  # Bucket midpoint (relative)
+        return results
+
+
+class CohortStats:
+    """
+    Running cohort statistics for one course
+    Each learner's last scores are kept as a small bytes row (topic mastery, then
+    DISTRIBUTIONS), so an update only moves that learner's changed scores between bins
+    """
+    def __init__(self, topics):
+        self.topics = tuple(topics)
+        self.learners = {}          # learner key -> bytes of 0-100 scores
+        self._seen = {}             # learner key -> time of their last update (newest wins in merges)
+        self.mastery = [[0] * SCALE for _ in self.topics]
+        self.distributions = {name: [0] * SCALE for name in DISTRIBUTIONS}
+        self.topic_answers = [[0, 0] for _ in self.topics]     # [answers, correct]
+        self.questions = {}         # question id -> [attempts, misses]
+        self.response_times = QuantileSketch()
+        self.answers = 0
+        self._version = 0           # Bumped by every update; invalidates the cached snapshot
+        self._histograms = self.mastery + [self.distributions[name] for name in DISTRIBUTIONS]
+        self._topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        self._empty = bytes(len(self._histograms))
+        self._lock = threading.Lock()
+        self._cache = None          # (version, limit, snapshot)
+
+    def record_answer(self, question_id, topic, is_correct, time_taken):
+        """Count one graded answer"""
+        with self._lock:
+            self._version += 1
+            self.answers += 1
+            stats = self.questions.get(question_id)
+            if stats is None:
+                stats = self.questions[question_id] = [0, 0]
+            stats[0] += 1
+            if not is_correct:
+                stats[1] += 1
+            i = self._topic_index.get(topic)
+            if i is not None:
+                self.topic_answers[i][0] += 1
+                self.topic_answers[i][1] += is_correct
+            self.response_times.add(time_taken)
+
+    def update_learner(self, learner_id, row, seen=None):
+        """Move the learner to their current scores (engine.cohort_scores(), after their answers)"""
+        with self._lock:
+            self._version += 1
+            self._seen[learner_id] = time.time() if seen is None else seen
+            previous = self.learners.get(learner_id)
+            if previous == row:
+                return
+            self.learners[learner_id] = row
+            if previous is None:
+                previous = self._empty
+                for histogram in self._histograms:
+                    histogram[0] += 1   # New learners enter at zero and move from there
+            for histogram, old, new in zip(self._histograms, previous, row):
+                if old != new:
+                    histogram[old] -= 1
+                    histogram[new] += 1
+
+    def snapshot(self, limit=10):
+        """Cohort summary; cached until the next answer"""
+        with self._lock:
+            if self._cache is not None and self._cache[:2] == (self._version, limit):
+                return self._cache[2]
+            learners = len(self.learners)
+            most_missed = heapq.nlargest(
+                limit, self.questions.items(), key=lambda item: (item[1][1], item[1][1] / item[1][0]))
+            snapshot = {
+                'learners': learners,
+                'answers': self.answers,
+                'readiness': {
+                    name: histogram_summary(self.distributions[name], learners) for name in DISTRIBUTIONS[:3]
+                },
+                'competence': histogram_summary(self.distributions['competence'], learners),
+                'topic_mastery': {
+                    topic: dict(
+                        histogram_summary(self.mastery[i], learners),
+                        answers=self.topic_answers[i][0],
+                        accuracy=round(self.topic_answers[i][1] / self.topic_answers[i][0] * 100, 1)
+                        if self.topic_answers[i][0] else None
+                    )
+                    for i, topic in enumerate(self.topics)
+                },
+                'most_missed': [
+                    {'question_id': question_id, 'attempts': attempts, 'misses': misses,
+                     'miss_rate': round(misses / attempts * 100, 1)}
+                    for question_id, (attempts, misses) in most_missed if misses
+                ],
+                'response_time': dict(zip(
+                    ('p50', 'p90', 'p99'),
+                    (round(value, 1) if value is not None else None
+                     for value in self.response_times.quantiles((0.5, 0.9, 0.99)))
+                ))
+            }
+            self._cache = (self._version, limit, snapshot)
+            return snapshot
+
+    def export(self):
+        """JSON-serialisable counts and learner rows, for merging with other processes"""
+        with self._lock:
+            sketch = self.response_times
+            return {
+                'topics': list(self.topics),
+                'answers': self.answers,
+                'topic_answers': [list(counts) for counts in self.topic_answers],
+                'questions': [[question_id, attempts, misses]
+                              for question_id, (attempts, misses) in self.questions.items()],
+                'response_times': [sketch.zeros, sketch.count, list(sketch.buckets.items())],
+                'learners': [[key, row.hex(), self._seen[key]] for key, row in self.learners.items()]
+            }
+
+    def merge(self, export):
+        """Add another process's export: its answers, and its learners where its scores are newer"""
+        if tuple(export['topics']) != self.topics:
+            raise ValueError('cannot merge cohort statistics of a different topic taxonomy')
+        with self._lock:
+            self._version += 1
+            self.answers += export['answers']
+            for counts, (answers, correct) in zip(self.topic_answers, export['topic_answers']):
+                counts[0] += answers
+                counts[1] += correct
+            for question_id, attempts, misses in export['questions']:
+                stats = self.questions.get(question_id)
+                if stats is None:
+                    stats = self.questions[question_id] = [0, 0]
+                stats[0] += attempts
+                stats[1] += misses
+            zeros, count, buckets = export['response_times']
+            sketch = self.response_times
+            sketch.zeros += zeros
+            sketch.count += count
+            for k, n in buckets:
+                sketch.buckets[k] = sketch.buckets.get(k, 0) + n
+        for key, row, seen in export['learners']:
+            if seen >= self._seen.get(key, seen):
+                self.update_learner(key, bytes.fromhex(row), seen)
+
+
+def _export_name(course_id, pid):
+    return f'cohort-{course_id}-{pid}.json'
+
+
+class CohortExports:
+    """
+    Cohort statistics merged across the worker processes of one server (COHORT_STATS_DIR)
+    Each process writes its courses' statistics to the shared directory every interval
+    seconds, and its own again before merging. Merges sum every export's answers, including
+    those of exited workers, and count each learner once, at their newest scores (a learner's
+    answers may be served by any worker)
+    """
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self._exported = {}         # course id -> version last written by this process
+        self._cache = {}            # course id -> (export signatures, merged CohortStats)
+        self._lock = threading.RLock()
+        self._exporter_pid = None
+
+    def export(self, course_id, stats):
+        """Write this process's statistics for a course (atomically), if they changed"""
+        with self._lock:
+            version = stats._version
+            if not version or self._exported.get(course_id) == version:
+                return
+            path = os.path.join(self.directory, _export_name(course_id, os.getpid()))
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as fp:
+                json.dump(stats.export(), fp, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            self._exported[course_id] = version
+
+    def start(self, stats_by_course):
+        """Export every course in stats_by_course each interval from a daemon thread (once per process)"""
+        if self._exporter_pid == os.getpid():
+            return
+        if self._exporter_pid is None:
+            # Threads do not survive fork: every forked worker starts its own exporter
+            os.register_at_fork(after_in_child=lambda: self.start(stats_by_course))
+        self._exporter_pid = os.getpid()
+        self._exported = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+        def run():
+            while True:
+                for course_id, stats in list(stats_by_course.items()):
+                    try:
+                        self.export(course_id, stats)
+                    except OSError as e:
+                        print(f"Could not export cohort statistics to {self.directory}: {e}")
+                time.sleep(self.interval)
+        threading.Thread(target=run, name='cohort-exporter', daemon=True).start()
+
+    def _exports(self, course_id):
+        """[(path, signature)] of every process's export for a course"""
+        found = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not (name.startswith('cohort-') and name.endswith('.json')):
+                continue
+            exported_course, _, pid = name[len('cohort-'):-len('.json')].rpartition('-')
+            if exported_course == course_id and pid.isdigit():
+                stat = entry.stat()
+                found.append((entry.path, (name, stat.st_mtime_ns, stat.st_size)))
+        return sorted(found)
+
+    def snapshot(self, course_id, stats, limit=10):
+        """Snapshot of the course's statistics over every process, plus how many were merged"""
+        with self._lock:
+            self.export(course_id, stats)
+            exports = self._exports(course_id)
+            signatures = tuple(signature for _, signature in exports)
+            cached = self._cache.get(course_id)
+            if cached is None or cached[0] != signatures:
+                merged = CohortStats(stats.topics)
+                for path, _ in exports:
+                    try:
+                        with open(path) as fp:
+                            merged.merge(json.load(fp))
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        print(f"Skipping cohort statistics export {path}: {e}")
+                cached = self._cache[course_id] = (signatures, merged)
+        return dict(cached[1].snapshot(limit), processes=len(signatures))
+
+    def clear(self):
+        """Remove exports of earlier runs (call once, before any worker starts)"""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('cohort-') and entry.name.endswith(('.json', '.tmp')):
+                os.remove(entry.path)
@@ -0,0 +1,175 @@
+"""
+Course registry: many courses served from one deployment
+Each course is a directory COURSES_DIR/<course_id>/ holding course.json:
+
+    {
+        "title": "MATH F111 Mathematics I",
+        "topics": ["Limits", "Derivatives", "Integrals"],
+        "quiz_topics": ["Limits"],                  (optional, default: all topics)
+        "midsem_topics": ["Limits", "Derivatives"], (optional, default: all topics)
+        "tips": {"Limits": {"correct": "...", "incorrect": "..."}},
+        "questions": "questions.json"               (optional, relative to the course directory)
+    }
+
+Nothing is read at startup, so startup time does not grow with the number of courses.
+A course's taxonomy, tips and question bank are loaded on first use; the immutable bank is
+shared by all of the course's learners (and by courses naming the same bank file), and the
+least recently used courses are evicted once the loaded question budget is exceeded
+"""
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+COURSE_FILE = 'course.json'
+COURSE_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]{0,63}')
+DEFAULT_TIP = "Keep practicing to improve your understanding!"
+
+
+class CourseNotFound(LookupError):
+    """No course with this id on disk"""
+
+
+class Course:
+    """A loaded course: its engine class (topic taxonomy), learning tips and question bank"""
+    def __init__(self, course_id, title, engine_class, tips, bank):
+        self.id = course_id
+        self.title = title
+        self.engine_class = engine_class
+        self.tips = tips    # topic -> {True: tip, False: tip}
+        self.bank = bank
+
+    def learner_key(self, learner_id):
+        """Session / persistence key for a learner of this course"""
+        return f'{self.id}/{learner_id}'
+
+    def tip(self, topic, is_correct):
+        return self.tips.get(topic, {}).get(is_correct) or DEFAULT_TIP
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'topics': list(self.engine_class.TOPICS),
+            'questions': len(self.bank)
+        }
+
+
+class CourseRegistry:
+    """
+    Lazily loaded courses in LRU order
+    engine_class.for_topics() builds each course's engine class; load_bank(path) builds a bank
+    """
+    def __init__(self, root, engine_class, load_bank, max_courses=32, max_questions=200000):
+        self.root = root
+        self.engine_class = engine_class
+        self.load_bank = load_bank
+        self.max_courses = max_courses        # Loaded courses kept in RAM
+        self.max_questions = max_questions    # Loaded questions kept in RAM (memory budget)
+
+        self._loaded = OrderedDict()                  # course id -> Course, least recently used first
+        self._load_locks = {}                         # course id -> lock held while loading it
+        self._banks = weakref.WeakValueDictionary()   # bank file path -> QuestionBank
+        self._engine_classes = {}                     # taxonomy -> engine class
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, course_id):
+        """Return the course, loading it on first use; None for unknown courses"""
+        with self._lock:
+            course = self._loaded.get(course_id)
+            if course is not None:
+                self.hits += 1
+                self._loaded.move_to_end(course_id)
+                return course
+        if not self.exists(course_id):
+            return None
+
+        # One loader per course; requests for other courses are not held up meanwhile
+        with self._lock:
+            load_lock = self._load_locks.setdefault(course_id, threading.Lock())
+        with load_lock:
+            with self._lock:
+                course = self._loaded.get(course_id)
+            if course is None:
+                course = self._load(course_id)
+                with self._lock:
+                    self._loaded[course_id] = course
+                    self.loads += 1
+                    self._evict()
+        return course
+
+    def exists(self, course_id):
+        return (isinstance(course_id, str) and COURSE_ID_PATTERN.fullmatch(course_id) is not None
+                and os.path.isfile(os.path.join(self.root, course_id, COURSE_FILE)))
+
+    def available(self):
+        """Ids of every course on disk (a directory scan; nothing is loaded)"""
+        try:
+            with os.scandir(self.root) as entries:
+                return sorted(entry.name for entry in entries if entry.is_dir() and self.exists(entry.name))
+        except OSError:
+            return []
+
+    def _load(self, course_id):
+        directory = os.path.join(self.root, course_id)
+        try:
+            with open(os.path.join(directory, COURSE_FILE), encoding='utf-8') as fp:
+                spec = json.load(fp)
+            topics = tuple(spec['topics'])
+            quiz_topics = tuple(spec.get('quiz_topics') or topics)
+            midsem_topics = tuple(spec.get('midsem_topics') or topics)
+            tips = {
+                topic: {True: tip.get('correct'), False: tip.get('incorrect')}
+                for topic, tip in spec.get('tips', {}).items()
+            }
+            bank_path = os.path.realpath(os.path.join(directory, spec.get('questions', 'questions.json')))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid {COURSE_FILE} for course {course_id}: {e!r}") from e
+        if not topics:
+            raise ValueError(f"Course {course_id} has no topics")
+
+        taxonomy = (topics, quiz_topics, midsem_topics)
+        engine_class = self._engine_classes.get(taxonomy)
+        if engine_class is None:
+            engine_class = self._engine_classes[taxonomy] = self.engine_class.for_topics(*taxonomy)
+
+        bank = self._banks.get(bank_path)
+        if bank is None:
+            bank = self._banks[bank_path] = self.load_bank(bank_path)
+        return Course(course_id, spec.get('title', course_id), engine_class, tips, bank)
+
+    def _evict(self):
+        """Drop least recently used courses over the course / question budget (keeps the newest)"""
+        while len(self._loaded) > 1 and (len(self._loaded) > self.max_courses or self._loaded_questions() > self.max_questions):
+            self._loaded.popitem(last=False)
+            self.evictions += 1
+
+    def _loaded_questions(self):
+        banks = {id(course.bank): course.bank for course in self._loaded.values()}
+        return sum(len(bank) for bank in banks.values())
+
+    def __len__(self):
+        return len(self._loaded)
+
+    def __contains__(self, course_id):
+        """Whether the course is loaded (get() will not touch the disk)"""
+        return course_id in self._loaded
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded_courses': list(self._loaded),
+                'loaded_questions': self._loaded_questions(),
+                'max_courses': self.max_courses,
+                'max_questions': self.max_questions,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
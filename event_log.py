@@ -0,0 +1,101 @@
+"""
+Append-only answer event log
+Events are JSON lines written by a background thread so /api/answer never waits on disk
+"""
+import atexit
+import json
+import queue
+import threading
+
+_STOP = object()
+
+
+class AnswerEventLog:
+    """JSONL log of answer events, one object per line"""
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Counters
+        self.appended = 0
+        self.written = 0
+        self.errors = 0
+
+    def append(self, event):
+        """Queue an event dict for writing"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='answer-event-log', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(event)
+        self.appended += 1
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as fp:
+            while True:
+                # Block for one event, then drain whatever else is queued as a batch
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = any(event is _STOP for event in batch)
+                lines = [json.dumps(event, separators=(',', ':')) for event in batch if event is not _STOP]
+                if lines:
+                    try:
+                        fp.write('\n'.join(lines) + '\n')
+                        fp.flush()
+                        self.written += len(lines)
+                    except OSError as e:
+                        self.errors += 1
+                        print(f"Error writing answer event log: {e}")
+                if stop:
+                    return
+
+    def close(self):
+        """Write out queued events and stop the writer thread"""
+        with self._lock:
+            if self._closed or self._thread is None:
+                self._closed = True
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        return {'appended': self.appended, 'written': self.written, 'errors': self.errors}
+
+
+def iter_event_chunks(path, chunk_size=10000, course=None, default_course=None):
+    """
+    Stream a log as lists of up to chunk_size events
+    With course set, only that course's events are kept; events without a course field
+    (logged before courses were recorded) belong to default_course
+    A torn final line (crash mid-write) is skipped
+    """
+    chunk = []
+    with open(path, 'r', encoding='utf-8') as fp:
+        for line_number, line in enumerate(fp, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed event at {path}:{line_number}")
+                continue
+            if course is not None and event.get('course', default_course) != course:
+                continue
+            chunk.append(event)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
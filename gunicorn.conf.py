@@ -0,0 +1,49 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+The app is imported once in the master and preload() builds the question bank there,
+so workers (including ones respawned or added later) fork with it already in memory,
+shared copy-on-write, and serve their first request without loading anything
+
+With several workers, learner state is shared through SQLite (LEARNER_STATE_SHARED=1 unless
+set otherwise), so every worker reads and updates the same engine for a learner
+
+With METRICS_ENABLED=1, also set METRICS_MULTIPROC_DIR (e.g. /tmp/engine-metrics) so
+/metrics reports the whole server rather than whichever worker answered the scrape.
+Cohort statistics (/api/cohort-insights) are merged the same way through COHORT_STATS_DIR,
+which defaults to a directory under the system temp dir when there are several workers
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+preload_app = True
+
+# Threaded workers: /api/insights/stream holds its thread for as long as a dashboard is open
+# (a sync worker would be blocked, then killed at its timeout). Each open stream uses one
+# of a worker's threads; for many concurrent dashboards serve the ASGI app (asgi.py) instead
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+if workers > 1:
+    # Set before the app is imported (preload), so every worker reads them. Without shared
+    # learner state each worker would adapt its own cached copy of a learner's engine
+    if os.environ.get('LEARNER_STATE_BACKEND', 'sqlite') == 'sqlite':
+        os.environ.setdefault('LEARNER_STATE_SHARED', '1')
+    os.environ.setdefault('COHORT_STATS_DIR', os.path.join(tempfile.gettempdir(), 'engine-cohort-stats'))
+
+
+def on_starting(server):
+    # Totals exported by a previous run's workers must not be merged into this one's
+    from metrics import metrics
+    metrics.clear_exports()
+    if os.environ.get('COHORT_STATS_DIR'):
+        from cohort_stats import CohortExports
+        CohortExports(os.environ['COHORT_STATS_DIR']).clear()
+
+
+def when_ready(server):
+    # Runs in the master after the app import, before any worker is forked
+    import app
+    app.preload()
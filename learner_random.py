@@ -0,0 +1,47 @@
+"""
+Per-learner random number streams
+Each engine draws from its own small SplitMix64 generator instead of the shared global
+`random` module, so threads serving different learners never share RNG state and a run
+can be replayed exactly: with a seed (RANDOM_SEED), a learner's stream depends only on
+the seed and the learner id, not on how requests from other learners interleave
+"""
+import hashlib
+import random
+
+MASK64 = (1 << 64) - 1
+
+
+def learner_seed(seed, learner_id):
+    """Seed for a learner's stream, derived from a run seed (stable across processes)"""
+    digest = hashlib.blake2b(f'{seed}:{learner_id}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class LearnerRandom:
+    """
+    SplitMix64: one 64-bit integer of state (cheap enough to keep one per learner),
+    with the subset of the `random` API the engine uses
+    """
+    __slots__ = ('state',)
+
+    def __init__(self, seed=None):
+        # Unseeded streams draw their seed from the global RNG once, so random.seed() still
+        # makes scripts that build engines directly repeatable
+        self.state = (random.getrandbits(64) if seed is None else seed) & MASK64
+
+    def next64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self):
+        """Float in [0, 1)"""
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def randrange(self, n):
+        """Integer in [0, n) by multiply-shift (bias below n / 2**64, negligible for bank sizes)"""
+        return (self.next64() * n) >> 64
+
+    def choice(self, seq):
+        return seq[(self.next64() * len(seq)) >> 64]
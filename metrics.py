@@ -0,0 +1,390 @@
+"""
+Opt-in instrumentation for the learning engine
+Timing histograms and counters rendered in Prometheus text format (served at /metrics)
+
+Enabled with METRICS_ENABLED=1; when disabled, timed() returns functions unwrapped
+and count() returns immediately, so the hot paths pay (almost) nothing. When enabled,
+engine methods are timed on one call in METRICS_ENGINE_SAMPLE (default 16), so
+engine_method_duration_seconds is a sample: its _count is calls / METRICS_ENGINE_SAMPLE.
+analyze_performance, the hottest method, is not timed (the /api/answer route covers it).
+Measured by benchmarks/metrics_overhead.py: about 1-2% per HTTP request, but about 4-5%
+of the bare engine hot path (wrapper calls and counters on microsecond methods), so
+leave metrics off for engine-bound batch jobs such as replay.py
+
+Metrics are collected per process. With several workers behind one port (gunicorn), set
+METRICS_MULTIPROC_DIR to a directory the workers share: each process exports its totals
+there every METRICS_EXPORT_INTERVAL seconds (default 1), and /metrics, served by any
+worker, merges every process's file. Counters and histograms are summed over all files,
+including those of exited workers, so totals never go backwards; gauges are summed over
+live processes. gunicorn.conf.py empties the directory when the master starts.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from functools import wraps
+
+ROUTE_KEY = 'metrics.route'    # WSGI environ key holding the matched route rule
+
+# Seconds; engine methods are microseconds, routes are sub-millisecond to tens of ms
+DEFAULT_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Bucketed timing histogram keyed by label values
+    observe() only appends to a per-series array (atomic under the GIL, no lock);
+    samples are sorted into buckets in bulk when the buffer fills or at scrape time
+    """
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS, buffer_size=4096):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.buffer_size = buffer_size
+        self._samples = {}  # label values -> array('d') of unfolded samples
+        self._series = {}   # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def samples(self, labels):
+        """The sample buffer for a series (stable, so callers may keep a reference)"""
+        samples = self._samples.get(labels)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(labels, array('d'))
+        return samples
+
+    def observe(self, labels, value):
+        samples = self._samples.get(labels)
+        if samples is None:
+            samples = self.samples(labels)
+        samples.append(value)
+        if len(samples) >= self.buffer_size:
+            self.fold(labels, samples)
+
+    def fold(self, labels, samples):
+        """Move buffered samples into the buckets"""
+        with self._lock:
+            count = len(samples)
+            if not count:
+                return
+            values = sorted(samples[:count])
+            del samples[:count]  # Samples appended meanwhile stay buffered
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts, below = series[0], 0
+            for index, bound in enumerate(self.buckets):
+                upto = bisect_right(values, bound)
+                counts[index] += upto - below
+                below = upto
+            counts[-1] += count - below
+            series[1] += sum(values)
+
+    def snapshot(self):
+        """label values -> (per-bucket counts, sum), with every buffered sample folded in"""
+        for labels, samples in list(self._samples.items()):
+            self.fold(labels, samples)
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self, series=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        series = self.snapshot() if series is None else series
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = _labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter keyed by label values
+    inc() appends a tick to a per-series array (no lock), summed in bulk like Histogram
+    """
+    def __init__(self, name, help_text, label_names=(), buffer_size=4096):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buffer_size = buffer_size
+        self._ticks = {}   # label values -> array('B') of unfolded ticks
+        self._values = {}  # label values -> folded total
+        self._lock = threading.Lock()
+
+    def inc(self, labels):
+        ticks = self._ticks.get(labels)
+        if ticks is None:
+            with self._lock:
+                ticks = self._ticks.setdefault(labels, array('B'))
+        ticks.append(1)
+        if len(ticks) >= self.buffer_size:
+            self.fold(labels, ticks)
+
+    def fold(self, labels, ticks):
+        with self._lock:
+            count = len(ticks)
+            del ticks[:count]
+            self._values[labels] = self._values.get(labels, 0) + count
+
+    def value(self, labels):
+        ticks = self._ticks.get(labels)
+        if ticks is not None:
+            self.fold(labels, ticks)
+        return self._values.get(labels, 0)
+
+    def snapshot(self):
+        """label values -> total, with every buffered tick folded in"""
+        for labels, ticks in list(self._ticks.items()):
+            self.fold(labels, ticks)
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, values=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        values = self.snapshot() if values is None else values
+        lines.extend(f'{self.name}{_labels(self.label_names, labels)} {value}' for labels, value in sorted(values.items()))
+        return lines
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass    # Exists but is not ours to signal
+    return True
+
+
+class MetricsRegistry:
+    """The engine's metric families plus scrape-time gauges"""
+    def __init__(self, enabled=False, multiproc_dir=None, export_interval=1.0, engine_sample=16):
+        self.enabled = enabled
+        self.engine_sample = max(1, engine_sample)   # Engine methods time one call in this many
+        self.multiproc_dir = multiproc_dir      # Shared export directory (multi-worker), or None
+        self.export_interval = export_interval
+        self._exporter_pid = None
+        # Request counts per status are the histogram's _count series
+        self.route_seconds = Histogram(
+            'http_request_duration_seconds', 'Time spent handling a request', ('route', 'method', 'status'))
+        self.engine_seconds = Histogram(
+            'engine_method_duration_seconds',
+            'Time spent in CS_F111_AI_Engine methods (sampled, one call in METRICS_ENGINE_SAMPLE)', ('method',))
+        self.learning_modes = Counter(
+            'engine_learning_mode_total', 'Questions selected per learning mode', ('mode',))
+        self.selection_fallbacks = Counter(
+            'engine_selection_fallback_total', 'Question selections that fell back to a wider pool', ('reason',))
+        self.reviews_served = Counter(
+            'engine_reviews_served_total', 'Due spaced-repetition reviews served')
+        self.exceptions = Counter(
+            'exceptions_total', 'Exceptions caught while serving requests', ('route', 'type'))
+        self._families = [
+            self.route_seconds, self.engine_seconds,
+            self.learning_modes, self.selection_fallbacks, self.reviews_served, self.exceptions
+        ]
+        self._gauges = []  # (name, help, type, callable returning a number)
+
+    def timed(self, method):
+        """Decorator timing an engine method into engine_seconds (no-op when disabled)"""
+        def decorate(func):
+            if not self.enabled:
+                return func
+            histogram = self.engine_seconds
+            labels = (method,)
+            samples = histogram.samples(labels)
+            append = samples.append
+            limit = histogram.buffer_size
+            clock = time.perf_counter
+            sample = self.engine_sample
+            calls = itertools.count().__next__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if calls() % sample:
+                    return func(*args, **kwargs)
+                start = clock()
+                result = func(*args, **kwargs)  # Calls that raise are counted by exceptions_total
+                append(clock() - start)
+                if len(samples) >= limit:
+                    histogram.fold(labels, samples)
+                return result
+            return wrapper
+        return decorate
+
+    def count(self, counter, *labels):
+        if self.enabled:
+            counter.inc(labels)
+
+    def exception(self, route, error):
+        if self.enabled:
+            self.exceptions.inc((route, type(error).__name__))
+
+    def observe_request(self, route, method, status, seconds):
+        self.route_seconds.observe((route, method, str(status)), seconds)
+
+    def wsgi_middleware(self, wsgi_app):
+        """
+        Time every WSGI request into route_seconds / requests
+        The app stores the matched route rule (e.g. /api/questions/<question_id>) in the
+        environ under ROUTE_KEY; requests matching no rule are labelled 'unmatched', so
+        404 probes cannot blow up label cardinality
+        """
+        clock = time.perf_counter
+
+        def timed_app(environ, start_response):
+            start = clock()
+            status = ['500']
+
+            def capture_status(status_line, headers, exc_info=None):
+                status[0] = status_line[:3]
+                return start_response(status_line, headers, exc_info)
+
+            try:
+                return wsgi_app(environ, capture_status)
+            finally:
+                self.observe_request(environ.get(ROUTE_KEY, 'unmatched'),
+                                     environ.get('REQUEST_METHOD', ''), status[0], clock() - start)
+        timed_app.__wrapped__ = wsgi_app
+        return timed_app
+
+    def gauge(self, name, help_text, func, kind='gauge'):
+        """Register a value read at scrape time (kind='counter' for existing running totals)"""
+        self._gauges.append((name, help_text, kind, func))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        if self.multiproc_dir:
+            return self._render_merged()
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        for name, help_text, kind, func in self._gauges:
+            lines.extend((f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {_number(func())}'))
+        return '\n'.join(lines) + '\n'
+
+    # Multi-process collection (METRICS_MULTIPROC_DIR)
+
+    def _export_path(self, pid):
+        return os.path.join(self.multiproc_dir, f'metrics-{pid}.json')
+
+    def export(self):
+        """Write this process's totals to the shared directory (atomically)"""
+        pid = os.getpid()
+        data = {
+            'families': {
+                family.name: [[list(labels), value] for labels, value in family.snapshot().items()]
+                for family in self._families
+            },
+            'gauges': {name: func() for name, _, _, func in self._gauges}
+        }
+        path = self._export_path(pid)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(data, fp, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def start_exporter(self):
+        """Export every export_interval seconds from a daemon thread (once per process)"""
+        if not (self.enabled and self.multiproc_dir) or self._exporter_pid == os.getpid():
+            return
+        if self._exporter_pid is None:
+            # Threads do not survive fork: every forked worker starts its own exporter
+            os.register_at_fork(after_in_child=self.start_exporter)
+        self._exporter_pid = os.getpid()
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+
+        def run():
+            while True:
+                try:
+                    self.export()
+                except OSError as e:
+                    print(f"Could not export metrics to {self.multiproc_dir}: {e}")
+                time.sleep(self.export_interval)
+        threading.Thread(target=run, name='metrics-exporter', daemon=True).start()
+
+    def _render_merged(self):
+        """Render the sum of every process's exported totals (this process's are fresh)"""
+        self.export()
+        merged = {family.name: {} for family in self._families}
+        gauges = {name: 0 for name, _, _, _ in self._gauges}
+        kinds = {name: kind for name, _, kind, _ in self._gauges}
+        for entry in os.scandir(self.multiproc_dir):
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.json')):
+                continue
+            try:
+                pid = int(entry.name[len('metrics-'):-len('.json')])
+                with open(entry.path) as fp:
+                    data = json.load(fp)
+            except (ValueError, OSError):
+                continue
+            alive = _pid_alive(pid)
+            for name, series in data.get('families', {}).items():
+                target = merged.get(name)
+                if target is None:
+                    continue
+                for labels, value in series:
+                    labels = tuple(labels)
+                    if isinstance(value, list):     # Histogram: [counts, sum]
+                        counts, total = value
+                        current = target.get(labels)
+                        if current is None:
+                            target[labels] = (list(counts), total)
+                        else:
+                            target[labels] = ([a + b for a, b in zip(current[0], counts)], current[1] + total)
+                    else:
+                        target[labels] = target.get(labels, 0) + value
+            for name, value in data.get('gauges', {}).items():
+                # Running totals survive their worker; point-in-time gauges only count live ones
+                if name in gauges and (alive or kinds[name] == 'counter'):
+                    gauges[name] += value
+
+        lines = []
+        for family in self._families:
+            lines.extend(family.render(merged[family.name]))
+        for name, help_text, kind, _ in self._gauges:
+            lines.extend((f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {_number(gauges[name])}'))
+        return '\n'.join(lines) + '\n'
+
+    def clear_exports(self):
+        """Remove exported totals of earlier runs (call once, before any worker starts)"""
+        if not self.multiproc_dir or not os.path.isdir(self.multiproc_dir):
+            return
+        for entry in os.scandir(self.multiproc_dir):
+            if entry.name.startswith('metrics-') and entry.name.endswith(('.json', '.tmp')):
+                os.remove(entry.path)
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+metrics = MetricsRegistry(
+    enabled=os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes', 'on'),
+    multiproc_dir=os.environ.get('METRICS_MULTIPROC_DIR') or None,
+    export_interval=float(os.environ.get('METRICS_EXPORT_INTERVAL', 1.0)),
+    engine_sample=int(os.environ.get('METRICS_ENGINE_SAMPLE', 16))
+)
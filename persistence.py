@@ -0,0 +1,307 @@
+"""
+Learner state persistence for the AI engine
+Pluggable backends with a write-behind writer that batches snapshots off the request path
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared multi-process state is unavailable
+    fcntl = None
+
+
+class StateBackend:
+    """Interface for learner state storage (state is opaque bytes)"""
+    def load(self, learner_id):
+        raise NotImplementedError
+
+    def save_many(self, items):
+        """Persist [(learner_id, state_bytes), ...] as one batch"""
+        raise NotImplementedError
+
+    def delete(self, learner_id):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """In-process backend, useful for development and replays"""
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, learner_id):
+        with self._lock:
+            return self._states.get(learner_id)
+
+    def save_many(self, items):
+        with self._lock:
+            self._states.update(items)
+
+    def delete(self, learner_id):
+        with self._lock:
+            self._states.pop(learner_id, None)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    SQLite backend (default)
+    One connection per thread; WAL mode so readers never block the writer
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS learner_state ('
+            ' learner_id TEXT PRIMARY KEY,'
+            ' state BLOB NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        if self._pid != os.getpid():
+            # Forked (e.g. gunicorn --preload): never reuse the parent's connections
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._connections = []
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def load(self, learner_id):
+        row = self._connect().execute(
+            'SELECT state FROM learner_state WHERE learner_id = ?', (learner_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, items):
+        # Group commit: every snapshot in the batch shares one transaction
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO learner_state (learner_id, state, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(learner_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at',
+                [(learner_id, state, now) for learner_id, state in items]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, learner_id):
+        self._connect().execute('DELETE FROM learner_state WHERE learner_id = ?', (learner_id,))
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class WriteBehindWriter:
+    """
+    Buffers learner snapshots and flushes them to a backend from a background thread
+    Repeated saves of the same learner coalesce, so only the latest snapshot is written
+    """
+    def __init__(self, backend, flush_interval=0.05, batch_size=500):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._pending = {}  # learner_id -> latest state bytes
+        self._inflight = {}  # learner_id -> state bytes being written (readable until committed)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        # Counters
+        self.saves = 0
+        self.flushes = 0
+        self.written = 0
+        self.errors = 0
+
+    def save(self, learner_id, state):
+        """Queue a snapshot; never touches disk on the caller's thread"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('writer is closed')
+            self._pending[learner_id] = state
+            self.saves += 1
+            if self._thread is None:
+                self._start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def load(self, learner_id):
+        """Return the newest snapshot, preferring one that is still queued or being written"""
+        with self._cond:
+            state = self._pending.get(learner_id)
+            if state is None:
+                state = self._inflight.get(learner_id)
+        if state is not None:
+            return state
+        return self.backend.load(learner_id)
+
+    def delete(self, learner_id):
+        with self._cond:
+            self._pending.pop(learner_id, None)
+            self._inflight.pop(learner_id, None)
+        self.backend.delete(learner_id)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='learner-state-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return  # close() performs the final flush
+                if len(self._pending) < self.batch_size:
+                    # Let more snapshots accumulate for group commit
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write all queued snapshots in one batch"""
+        with self._cond:
+            if not self._pending:
+                return 0
+            batch = list(self._pending.items())
+            self._pending.clear()
+            # Until the batch commits, loads must still find it (the backend is stale)
+            self._inflight.update(batch)
+
+        try:
+            self.backend.save_many(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error persisting learner state: {e}")
+            # Requeue unless a newer snapshot arrived meanwhile
+            with self._cond:
+                for learner_id, state in batch:
+                    self._pending.setdefault(learner_id, state)
+                self._drop_inflight(batch)
+            if self._closed:
+                return 0
+            time.sleep(self.flush_interval)
+            return 0
+
+        with self._cond:
+            self._drop_inflight(batch)
+        self.flushes += 1
+        self.written += len(batch)
+        return len(batch)
+
+    def _drop_inflight(self, batch):
+        """Forget a finished batch, keeping entries a concurrent flush has replaced since"""
+        for learner_id, state in batch:
+            if self._inflight.get(learner_id) is state:
+                del self._inflight[learner_id]
+
+    def close(self):
+        """Flush outstanding snapshots and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'saves': self.saves,
+                'flushes': self.flushes,
+                'written': self.written,
+                'errors': self.errors
+            }
+
+
+class SharedStateStore:
+    """
+    Worker-safe learner state for multi-process (gunicorn) deployments
+    Every worker reads and writes the same SQLite file; read-modify-write cycles
+    hold a per-learner lock (hashed into stripes) across threads and processes
+    """
+    def __init__(self, backend, lock_path, stripes=4096):
+        if fcntl is None:
+            raise RuntimeError('shared learner state requires fcntl (POSIX only)')
+        if not isinstance(backend, SQLiteStateBackend):
+            raise ValueError('shared learner state requires the sqlite backend')
+        self.backend = backend
+        self.lock_path = lock_path
+        self.stripes = stripes
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+
+        # Counters
+        self.updates = 0
+
+    def _stripe(self, learner_id):
+        return zlib.crc32(learner_id.encode('utf-8')) % self.stripes
+
+    @contextmanager
+    def lock(self, learner_id):
+        """
+        Exclusive lock on a learner's stripe
+        fcntl byte-range locks are per process, so threads also take a local lock
+        """
+        stripe = self._stripe(learner_id)
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def load(self, learner_id):
+        return self.backend.load(learner_id)
+
+    def save(self, learner_id, state):
+        """Write through; callers hold lock(learner_id) so the update is atomic"""
+        self.backend.save_many([(learner_id, state)])
+        self.updates += 1
+
+    def stats(self):
+        return {'stripes': self.stripes, 'updates': self.updates}
+
+
+def create_backend(kind, path=None):
+    """Build a state backend by name ('sqlite', 'memory' or 'none')"""
+    if kind == 'sqlite':
+        return SQLiteStateBackend(path)
+    if kind == 'memory':
+        return MemoryStateBackend()
+    if kind in ('none', '', None):
+        return None
+    raise ValueError(f"Unknown state backend: {kind}")
@@ -0,0 +1,415 @@
+"""
+Streaming question loader for CS F111 (and other course) question banks
+Reads JSON / JSONL banks record by record and keeps a compact binary cache
+"""
+import gc
+import json
+import marshal
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+# Fields kept for every question record, in cache order
+QUESTION_FIELDS = (
+    'id', 'question', 'options', 'correct', 'topic', 'difficulty',
+    'explanation', 'exam_type', 'marks', 'time_estimate', 'course'
+)
+REQUIRED_FIELDS = ('id', 'question', 'options', 'correct', 'topic', 'difficulty')
+
+CACHE_MAGIC = b'QBNK'
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct('<4sHqqq')  # magic, version, source size, source mtime_ns, payload size
+CACHE_FRAME = struct.Struct('<I')        # Length prefix of each marshal-encoded block
+
+CHUNK_SIZE = 1 << 20  # 1 MiB read chunks
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic GC while bulk-allocating question records
+    Records are acyclic, so collections during a load only cost time
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class QuestionSchemaError(ValueError):
+    """Raised when a question record does not match the expected schema"""
+    def __init__(self, message, position=None):
+        if position is not None:
+            message = f"record {position}: {message}"
+        super().__init__(message)
+        self.position = position
+
+
+def validate_question(record, position=None):
+    """Validate a single question record and return it normalised"""
+    if not isinstance(record, dict):
+        raise QuestionSchemaError('record is not an object', position)
+
+    missing = [field for field in REQUIRED_FIELDS if field not in record]
+    if missing:
+        raise QuestionSchemaError(f"missing fields {', '.join(missing)}", position)
+
+    options = record['options']
+    if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+        raise QuestionSchemaError('options must be a list of at least two strings', position)
+
+    correct = record['correct']
+    if not isinstance(correct, int) or isinstance(correct, bool) or not 0 <= correct < len(options):
+        raise QuestionSchemaError('correct must index into options', position)
+
+    difficulty = record['difficulty']
+    if not isinstance(difficulty, int) or isinstance(difficulty, bool) or not 1 <= difficulty <= 5:
+        raise QuestionSchemaError('difficulty must be an integer from 1 to 5', position)
+
+    if not isinstance(record['question'], str) or not isinstance(record['topic'], str):
+        raise QuestionSchemaError('question and topic must be strings', position)
+
+    for field in ('marks', 'time_estimate'):
+        value = record.get(field)
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+            raise QuestionSchemaError(f'{field} must be a number', position)
+
+    # Drop unknown fields so every record has the same compact shape
+    return {field: record[field] for field in QUESTION_FIELDS if field in record}
+
+
+class _JSONStream:
+    """Incremental JSON value reader over a text file"""
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Read another chunk, discarding the already consumed prefix"""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise QuestionSchemaError(f"expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_comma(self, closing):
+        """Consume a separator; return False once the closing bracket is reached"""
+        char = self.peek()
+        if char == ',':
+            self.pos += 1
+            return True
+        if char == closing:
+            self.pos += 1
+            return False
+        raise QuestionSchemaError(f"expected ',' or '{closing}' at offset {self.pos}")
+
+
+def _iter_array(stream):
+    """Yield the elements of the JSON array at the current stream position"""
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        if not stream.skip_comma(']'):
+            return
+
+
+def _iter_object_records(stream, metadata):
+    """
+    Yield question records from the JSON object at the current stream position
+    "metadata"/"course" keys must precede "questions" to tag records with a course
+    """
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'questions' and stream.peek() == '[':
+            course = metadata.get('course')
+            for record in _iter_array(stream):
+                if course and isinstance(record, dict):
+                    record.setdefault('course', course)
+                yield record
+        elif key == 'courses' and stream.peek() == '[':
+            # Multi-course bank: each course object streams its own questions
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield from _iter_object_records(stream, {})
+                    if not stream.skip_comma(']'):
+                        break
+        else:
+            value = stream.value()
+            if key == 'metadata' and isinstance(value, dict):
+                metadata.update(value)
+            elif key == 'course' and isinstance(value, str):
+                metadata['course'] = value
+        if not stream.skip_comma('}'):
+            return
+
+
+def _iter_json_records(fp, metadata):
+    """
+    Yield question records from a JSON document
+    Accepts a bare array or an object with a "questions" (or "courses") array
+    """
+    stream = _JSONStream(fp)
+    if stream.peek() == '[':
+        yield from _iter_array(stream)
+    else:
+        yield from _iter_object_records(stream, metadata)
+
+
+def _iter_jsonl_records(fp):
+    """Yield question records from a JSON Lines file"""
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_questions(path, strict=True, metadata=None):
+    """
+    Stream validated question records from a .json or .jsonl bank
+    With strict=False invalid records are skipped instead of raising
+    """
+    metadata = {} if metadata is None else metadata
+    with open(path, 'r', encoding='utf-8') as fp:
+        if path.endswith(('.jsonl', '.ndjson')):
+            records = _iter_jsonl_records(fp)
+        else:
+            records = _iter_json_records(fp, metadata)
+
+        for position, record in enumerate(records):
+            try:
+                yield validate_question(record, position)
+            except QuestionSchemaError as e:
+                if strict:
+                    raise
+                print(f"Skipping invalid question in {path}: {e}")
+
+
+def default_cache_path(path):
+    """Cache file kept in a .question_cache directory next to the bank"""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, '.question_cache', name + '.qbc')
+
+
+def _source_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _header_matches(header, path, file_size):
+    """A complete cache of this format for the current bank file"""
+    magic, version, size, mtime_ns, payload = header
+    return (magic == CACHE_MAGIC and version == CACHE_VERSION and file_size == CACHE_HEADER.size + payload
+            and (size, mtime_ns) == _source_signature(path))
+
+
+def _frames(mapped, offset):
+    """Yield the length-prefixed blocks of a mapped cache, one at a time"""
+    end = len(mapped)
+    while offset < end:
+        (length,) = CACHE_FRAME.unpack_from(mapped, offset)
+        offset += CACHE_FRAME.size
+        if offset + length > end:
+            raise EOFError('truncated question cache')
+        yield mapped[offset:offset + length]
+        offset += length
+
+
+def read_cache(path, cache_path=None):
+    """
+    Yield cached question records for a bank; yields nothing if the cache is stale/missing
+    Records are framed individually and decoded straight from the memory map as they
+    are consumed, so a warm load never holds more than one undecoded record
+    """
+    cache_path = cache_path or default_cache_path(path)
+    try:
+        fp = open(cache_path, 'rb')
+    except OSError:
+        return
+    with fp:
+        try:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        with mapped:
+            try:
+                if not _header_matches(CACHE_HEADER.unpack_from(mapped, 0), path, len(mapped)):
+                    return
+                frames = _frames(mapped, CACHE_HEADER.size)
+                fields = marshal.loads(next(frames))
+            except (OSError, ValueError, EOFError, TypeError, StopIteration, struct.error):
+                return
+            loads = marshal.loads
+            for frame in frames:
+                row = loads(frame)
+                yield {field: value for field, value in zip(fields, row) if value is not None}
+
+
+def cache_is_fresh(path, cache_path=None):
+    """Whether the binary cache exists, is complete and matches the bank file"""
+    try:
+        with open(cache_path or default_cache_path(path), 'rb') as fp:
+            header = CACHE_HEADER.unpack(fp.read(CACHE_HEADER.size))
+            return _header_matches(header, path, os.fstat(fp.fileno()).st_size)
+    except (OSError, struct.error):
+        return False
+
+
+def discard_cache(path, cache_path=None):
+    """Remove a bank's binary cache so the next load re-parses the bank file"""
+    try:
+        os.remove(cache_path or default_cache_path(path))
+    except OSError:
+        pass
+
+
+class CacheWriter:
+    """
+    Writes the binary cache record by record while a bank is parsed
+    The cache only replaces the old one on commit(); an aborted parse leaves no cache
+    """
+    def __init__(self, path, cache_path=None):
+        self.cache_path = cache_path or default_cache_path(path)
+        self.tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'  # Workers may parse concurrently
+        self.fp = None
+        self.payload = 0
+        try:
+            # Signature taken before parsing: edits made meanwhile invalidate the cache
+            self.signature = _source_signature(path)
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            self.fp = open(self.tmp_path, 'wb')
+            self.fp.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, *self.signature, 0))
+            self._frame(marshal.dumps(QUESTION_FIELDS))
+        except OSError as e:
+            self._fail(e)
+
+    def _frame(self, data):
+        self.fp.write(CACHE_FRAME.pack(len(data)))
+        self.fp.write(data)
+        self.payload += CACHE_FRAME.size + len(data)
+
+    def _fail(self, error):
+        print(f"Could not write question cache {self.cache_path}: {error}")
+        self.abort()
+
+    def add(self, record):
+        if self.fp is None:
+            return
+        try:
+            self._frame(marshal.dumps(tuple(record.get(field) for field in QUESTION_FIELDS)))
+        except OSError as e:
+            self._fail(e)
+
+    def commit(self):
+        if self.fp is None:
+            return
+        try:
+            # The payload size goes in last, so a partly written cache never looks complete
+            self.fp.seek(0)
+            self.fp.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, *self.signature, self.payload))
+            self.fp.close()
+            os.replace(self.tmp_path, self.cache_path)
+        except OSError as e:
+            self._fail(e)
+        self.fp = None
+
+    def abort(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def write_cache(path, records, cache_path=None):
+    """Write records as a compact binary cache of length-prefixed marshal rows"""
+    writer = CacheWriter(path, cache_path)
+    for record in records:
+        writer.add(record)
+    writer.commit()
+
+
+def load_questions(path, strict=True, use_cache=True, cache_path=None):
+    """
+    Stream question records from a bank file
+    Serves the binary cache on warm restarts and writes it alongside a full parse
+    """
+    if use_cache and cache_is_fresh(path, cache_path):
+        try:
+            # Decoded in full before anything is yielded, so a corrupt record part way
+            # through the cache cannot leave the caller holding half a bank
+            records = list(read_cache(path, cache_path))
+        except Exception as e:
+            print(f"Discarding unreadable question cache for {path}: {e!r}")
+            discard_cache(path, cache_path)
+        else:
+            yield from records
+            return
+
+    writer = CacheWriter(path, cache_path) if use_cache else None
+    try:
+        for record in iter_questions(path, strict=strict):
+            if writer is not None:
+                writer.add(record)
+            yield record
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.commit()
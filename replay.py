@@ -0,0 +1,240 @@
+"""
+Replay answer event logs through CS_F111_AI_Engine
+Rebuilds learner state (e.g. backfill after a crash) and/or evaluates
+question selection policies offline against the replayed learner states
+
+Usage:
+    python replay.py answer_events.jsonl --workers 4 --state-db learner_state.db
+    python replay.py answer_events.jsonl --policy default --policy mypolicies:harder_first
+
+A policy is "default" (the engine's select_optimal_question) or "module:function"
+naming a callable policy(engine, question_bank) -> question; the default policy
+sees spaced-repetition reviews due as of each event's timestamp
+
+Each event is replayed with its course's engine class and question bank (events without
+a course field belong to the built-in course); events of unknown courses are skipped
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+# Replays must never write to the live event log or state store on import
+os.environ['ANSWER_EVENT_LOG'] = 'none'
+os.environ['LEARNER_STATE_BACKEND'] = 'none'
+
+import app
+from event_log import iter_event_chunks
+from learner_random import learner_seed
+from persistence import SQLiteStateBackend
+
+
+def load_policy(spec):
+    """Resolve a policy spec to a callable(engine, question_bank)"""
+    if spec == 'default':
+        return lambda engine, bank, now=None: engine.select_optimal_question(bank, now=now)
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"Policy must be 'default' or 'module:function', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class PolicyStats:
+    """What a policy would have served, measured against each replayed event"""
+    def __init__(self):
+        self.decisions = 0
+        self.empty = 0
+        self.difficulty_sum = 0
+        self.weak_topic = 0
+        self.topic_agreement = 0
+        self.difficulty_agreement = 0
+
+    def record(self, engine, question, event):
+        self.decisions += 1
+        if question is None:
+            self.empty += 1
+            return
+        self.difficulty_sum += question.get('difficulty', 1)
+        self.weak_topic += question.get('topic') in engine.weak_topics
+        self.topic_agreement += question.get('topic') == event['topic']
+        self.difficulty_agreement += question.get('difficulty') == event['difficulty']
+
+    def merge(self, other):
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def summary(self):
+        served = self.decisions - self.empty
+        rate = lambda n: round(n / served * 100, 1) if served else 0
+        return {
+            'decisions': self.decisions,
+            'avg_difficulty': round(self.difficulty_sum / served, 2) if served else 0,
+            'weak_topic_rate': rate(self.weak_topic),
+            'topic_agreement': rate(self.topic_agreement),
+            'difficulty_agreement': rate(self.difficulty_agreement)
+        }
+
+
+class ReplayShard:
+    """
+    Engines for the subset of learners routed to one worker
+    Each learner's random stream is seeded from (seed, learner id), so results do not
+    depend on the worker count. Learner ids in the log are already course-scoped keys
+    """
+    def __init__(self, policy_specs=(), questions_path=None, seed=0):
+        self.seed = seed
+        self.engines = {}
+        self.events = 0
+        self.skipped = 0
+        self.bank = app.load_question_bank(questions_path) if questions_path else app.get_question_bank()
+        self.courses = {app.DEFAULT_COURSE: (app.CS_F111_AI_Engine, self.bank)}
+        self.policies = [(spec, load_policy(spec)) for spec in policy_specs]
+        self.policy_stats = {spec: PolicyStats() for spec in policy_specs}
+
+    def course_scope(self, course_id):
+        """(engine class, question bank) for a course id, or None for unknown courses"""
+        scope = self.courses.get(course_id, False)
+        if scope is False:
+            try:
+                course = app.resolve_course(course_id)
+                scope = (course.engine_class, course.bank)
+            except app.CourseNotFound:
+                print(f"Skipping events of unknown course {course_id!r}", file=sys.stderr)
+                scope = None
+            self.courses[course_id] = scope
+        return scope
+
+    def apply(self, chunk):
+        engines = self.engines
+        for event in chunk:
+            scope = self.course_scope(event.get('course', app.DEFAULT_COURSE))
+            if scope is None:
+                self.skipped += 1
+                continue
+            engine_class, bank = scope
+            engine = engines.get(event['learner'])
+            if engine is None:
+                engine = engines[event['learner']] = engine_class()
+                engine.seed(learner_seed(self.seed, event['learner']))
+
+            # Ask each policy what it would serve before this answer lands
+            for spec, policy in self.policies:
+                question = policy(engine, bank, now=event.get('ts')) if spec == 'default' else policy(engine, bank)
+                self.policy_stats[spec].record(engine, question, event)
+
+            engine.analyze_performance(
+                is_correct=bool(event['correct']),
+                difficulty=event.get('difficulty', 2),
+                time_taken=event.get('time', 15),
+                topic=event.get('topic', 'General')
+            )
+            engine.record_review(event['qid'], bool(event['correct']), event.get('time', 15), now=event.get('ts'))
+            self.events += 1
+
+    def save(self, state_db, batch_size=1000):
+        """Write rebuilt learner states to a SQLite state store"""
+        backend = SQLiteStateBackend(state_db)
+        items = [(learner_id, engine.serialize()) for learner_id, engine in self.engines.items()]
+        for start in range(0, len(items), batch_size):
+            backend.save_many(items[start:start + batch_size])
+        backend.close()
+
+
+def _worker(inbox, outbox, policy_specs, questions_path, state_db, seed):
+    shard = ReplayShard(policy_specs, questions_path, seed)
+    while True:
+        chunk = inbox.get()
+        if chunk is None:
+            break
+        shard.apply(chunk)
+    if state_db:
+        shard.save(state_db)
+    outbox.put((shard.events, shard.skipped, len(shard.engines), shard.policy_stats))
+
+
+def replay(paths, workers=1, chunk_size=10000, policy_specs=(), questions_path=None, state_db=None, seed=0):
+    """Replay logs, fanning learners out across worker processes; returns a report dict"""
+    start = time.perf_counter()
+    policy_stats = {spec: PolicyStats() for spec in policy_specs}
+
+    if workers <= 1:
+        shard = ReplayShard(policy_specs, questions_path, seed)
+        for path in paths:
+            for chunk in iter_event_chunks(path, chunk_size):
+                shard.apply(chunk)
+        if state_db:
+            shard.save(state_db)
+        events, skipped, learners = shard.events, shard.skipped, len(shard.engines)
+        for spec, stats in shard.policy_stats.items():
+            policy_stats[spec].merge(stats)
+    else:
+        outbox = multiprocessing.Queue()
+        inboxes = [multiprocessing.Queue(maxsize=8) for _ in range(workers)]
+        procs = [
+            multiprocessing.Process(target=_worker, args=(inbox, outbox, policy_specs, questions_path, state_db, seed))
+            for inbox in inboxes
+        ]
+        for p in procs:
+            p.start()
+
+        # Route every learner to one worker so their events stay in order
+        for path in paths:
+            for chunk in iter_event_chunks(path, chunk_size):
+                shards = [[] for _ in range(workers)]
+                for event in chunk:
+                    shards[zlib.crc32(str(event['learner']).encode('utf-8')) % workers].append(event)
+                for inbox, shard in zip(inboxes, shards):
+                    if shard:
+                        inbox.put(shard)
+
+        for inbox in inboxes:
+            inbox.put(None)
+        events = skipped = learners = 0
+        for _ in procs:
+            shard_events, shard_skipped, shard_learners, shard_stats = outbox.get()
+            events += shard_events
+            skipped += shard_skipped
+            learners += shard_learners
+            for spec, stats in shard_stats.items():
+                policy_stats[spec].merge(stats)
+        for p in procs:
+            p.join()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'events': events,
+        'skipped': skipped,
+        'learners': learners,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'events_per_second': round(events / elapsed) if elapsed else 0,
+        'policies': {spec: stats.summary() for spec, stats in policy_stats.items()}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay answer event logs through the CS F111 AI engine')
+    parser.add_argument('logs', nargs='+', help='answer event log files (JSONL)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--policy', action='append', default=[], help="'default' or module:function (repeatable)")
+    parser.add_argument('--questions', help='built-in course question bank for policy evaluation (default: app bank)')
+    parser.add_argument('--state-db', help='write rebuilt learner state to this SQLite file')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the learners\' random streams')
+    args = parser.parse_args(argv)
+
+    if args.state_db:
+        SQLiteStateBackend(args.state_db).close()  # Create the schema before workers race to it
+
+    report = replay(args.logs, args.workers, args.chunk_size, args.policy, args.questions, args.state_db, args.seed)
+    print(json.dumps(report, indent=2))
+    print(f"Replayed {report['events']} events for {report['learners']} learners "
+          f"in {report['seconds']}s ({report['events_per_second']} events/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Per-learner spaced-repetition scheduling (SM-2 style)
+Each answered question becomes a review card; due cards sit in a min-heap keyed by due
+time, so the next due review is found in O(log n) without scanning the learner's items
+"""
+import heapq
+from collections import deque
+
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+
+LAPSE_INTERVAL = 10 * MINUTE      # Missed items come back within the session
+FIRST_INTERVAL = 1 * DAY
+SECOND_INTERVAL = 6 * DAY
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+RECENT_WINDOW = 20                # Question ids never re-served back to back
+MAX_CARDS = 500                   # Per learner; the most mature cards are dropped beyond this
+TRIM_TO = MAX_CARDS * 3 // 4      # Cards kept by a trim, so trims run once per MAX_CARDS // 4 new cards
+
+
+def review_quality(is_correct, time_taken):
+    """SM-2 answer quality (0-5) from correctness and response time"""
+    if not is_correct:
+        return 1
+    if time_taken < 10:
+        return 5
+    if time_taken > 30:
+        return 3
+    return 4
+
+
+class ReviewScheduler:
+    """
+    Review cards for one learner
+    cards: question id -> [due, interval, ease, repetitions, lapses]
+    The heap holds (due, seq, question id); rescheduling pushes a new entry and
+    leaves the old one to be skipped lazily (its due no longer matches the card)
+    """
+    __slots__ = ('cards', '_heap', '_seq', 'recent')
+
+    def __init__(self):
+        self.cards = {}
+        self._heap = []
+        self._seq = 0
+        self.recent = deque(maxlen=RECENT_WINDOW)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def review(self, question_id, quality, now):
+        """Grade an answer (SM-2) and schedule the card's next review"""
+        card = self.cards.get(question_id)
+        if card is None:
+            card = self.cards[question_id] = [0.0, 0.0, INITIAL_EASE, 0, 0]
+
+        if quality < 3:
+            card[1] = LAPSE_INTERVAL
+            card[3] = 0
+            card[4] += 1
+        else:
+            card[3] += 1
+            if card[3] == 1:
+                card[1] = FIRST_INTERVAL
+            elif card[3] == 2:
+                card[1] = SECOND_INTERVAL
+            else:
+                card[1] = card[1] * card[2]
+        card[2] = max(MIN_EASE, card[2] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        card[0] = now + card[1]
+        self._push(card[0], question_id)
+        self.served(question_id)
+
+        if len(self.cards) > MAX_CARDS:
+            self._drop_mature()
+        elif len(self._heap) > 2 * len(self.cards) + 16:
+            self._compact()
+
+    def _push(self, due, question_id):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, question_id))
+
+    def next_due(self, now):
+        """
+        Most overdue card not served recently, or None; O(log n) amortised
+        Stale heap entries are discarded on the way
+        """
+        heap, cards, recent = self._heap, self.cards, self.recent
+        skipped = []
+        found = None
+        while heap and heap[0][0] <= now:
+            due, seq, question_id = heap[0]
+            card = cards.get(question_id)
+            if card is None or card[0] != due:
+                heapq.heappop(heap)
+            elif question_id in recent:
+                skipped.append(heapq.heappop(heap))
+            else:
+                found = question_id
+                break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
+    def due_count(self, now):
+        """Cards due at now (O(n); for reporting, not the request path)"""
+        return sum(1 for card in self.cards.values() if card[0] <= now)
+
+    def forget(self, question_id):
+        """Drop a card (e.g. its question left the bank); its heap entry goes stale"""
+        self.cards.pop(question_id, None)
+
+    def served(self, question_id):
+        self.recent.append(question_id)
+
+    def is_recent(self, question_id):
+        return question_id in self.recent
+
+    def _compact(self):
+        self._heap = [(card[0], i, question_id) for i, (question_id, card) in enumerate(self.cards.items())]
+        self._seq = len(self._heap)
+        heapq.heapify(self._heap)
+
+    def _drop_mature(self):
+        """
+        Keep TRIM_TO cards, dropping those with the longest intervals
+        Mature cards are rarely due, and the whole card set is persisted with every answer
+        (MAX_CARDS bounds that snapshot), so they are the cheapest to forget
+        """
+        keep = heapq.nsmallest(TRIM_TO, self.cards.items(), key=lambda item: item[1][1])
+        self.cards = dict(keep)
+        self._compact()
+
+    def to_state(self):
+        return [[[question_id] + card for question_id, card in self.cards.items()], list(self.recent)]
+
+    @classmethod
+    def from_state(cls, state):
+        scheduler = cls()
+        cards, recent = state
+        for question_id, *card in cards:
+            scheduler.cards[question_id] = card
+        scheduler.recent.extend(recent)
+        if len(scheduler.cards) > MAX_CARDS:
+            scheduler._drop_mature()  # Saved under a larger MAX_CARDS
+        else:
+            scheduler._compact()
+        return scheduler
@@ -0,0 +1,11 @@
+"""
+Shared test setup: import the app without touching the repo's state database or event log
+"""
+import os
+import sys
+
+os.environ['LEARNER_STATE_BACKEND'] = 'memory'
+os.environ['ANSWER_EVENT_LOG'] = 'none'
+os.environ.pop('LEARNER_STATE_SHARED', None)
+os.environ.pop('COHORT_STATS_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+"""
+Request validation in the Flask API handlers
+"""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/answer', '/api/answers'])
+@pytest.mark.parametrize('body', [[1, 2], 'text', 3])
+def test_non_object_json_bodies_are_bad_requests(client, path, body):
+    assert client.post(path, json=body).status_code == 400
+
+
+def test_learner_id_from_json_body(client):
+    response = client.post('/api/answer', json={'learner_id': 'api-test', 'question_id': 1, 'answer': 0})
+    assert response.status_code == 200
+    assert 'api-test' in app.engine_sessions
@@ -0,0 +1,29 @@
+"""
+IRT calibrator: lock-free ability reads while new learners are added
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import calibration  # noqa: E402
+from calibration import Calibrator  # noqa: E402
+
+
+def test_new_learner_is_readable_while_arrays_grow(monkeypatch):
+    """A reader interleaving with the array growth must never see a row past the arrays"""
+    calibrator = Calibrator([{'id': i, 'difficulty': 1 + i % 5} for i in range(20)], capacity=1)
+    adding = []
+    seen = []
+    concatenate = np.concatenate
+
+    def concatenate_with_reader(arrays, *args, **kwargs):
+        seen.append(calibrator.ability_of(adding[-1]))  # Another request thread reads meanwhile
+        return concatenate(arrays, *args, **kwargs)
+
+    monkeypatch.setattr(calibration.np, 'concatenate', concatenate_with_reader)
+    for i in range(40):
+        adding.append(f'learner-{i}')
+        calibrator.update([adding[-1]], [i % 20], [True])
+
+    assert seen and all(ability == 0.0 for ability in seen)
+    assert len(calibrator.learner_ids) == 40
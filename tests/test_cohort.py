@@ -0,0 +1,82 @@
+"""
+The vectorized cohort engine applies answer batches exactly like per-event analyze_performance
+"""
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app import CS_F111_AI_Engine  # noqa: E402
+from cohort import CohortEngine  # noqa: E402
+
+SESSION_START = 9   # to_state() index; set from the wall clock when a learner is created
+
+
+def random_events(count, learners, seed, engine_class=CS_F111_AI_Engine):
+    rng = random.Random(seed)
+    topics = engine_class.TOPICS
+    return [
+        (f'learner-{rng.randrange(learners)}', rng.choice(topics), rng.randint(1, 5),
+         rng.random() < 0.6, rng.uniform(2, 60))
+        for _ in range(count)
+    ]
+
+
+def assert_same_state(actual, expected):
+    assert len(actual) == len(expected)
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if i == SESSION_START:
+            continue
+        if isinstance(e, float):
+            assert a == pytest.approx(e, rel=1e-12, abs=1e-9), i
+        elif isinstance(e, list) and e and isinstance(e[0], float):
+            assert a == pytest.approx(e, rel=1e-12, abs=1e-9), i
+        else:
+            assert a == e, i
+
+
+COURSE_ENGINE = CS_F111_AI_Engine.for_topics(
+    ('Limits', 'Derivatives', 'Integrals', 'Series'), ('Limits',), ('Limits', 'Derivatives'))
+
+
+@pytest.mark.parametrize('engine_class', [CS_F111_AI_Engine, COURSE_ENGINE], ids=['cs-f111', 'course'])
+@pytest.mark.parametrize('batch_size', [1, 7, 500])
+def test_batches_match_scalar_engine(batch_size, engine_class):
+    events = random_events(1500, learners=25, seed=batch_size, engine_class=engine_class)
+    engines = {}
+    for learner_id, topic, difficulty, correct, time_taken in events:
+        engine = engines.setdefault(learner_id, engine_class())
+        engine.analyze_performance(correct, difficulty, time_taken, topic)
+
+    cohort = CohortEngine(engine_class, capacity=4)
+    for start in range(0, len(events), batch_size):
+        cohort.apply_events(*zip(*events[start:start + batch_size]))
+
+    assert len(cohort) == len(engines)
+    for learner_id, engine in engines.items():
+        assert_same_state(cohort.to_state(learner_id), engine.to_state())
+
+
+def test_loaded_engine_continues_like_scalar_engine():
+    events = random_events(400, learners=1, seed=1)
+    engine = CS_F111_AI_Engine()
+    for _, topic, difficulty, correct, time_taken in events[:200]:
+        engine.analyze_performance(correct, difficulty, time_taken, topic)
+
+    cohort = CohortEngine(CS_F111_AI_Engine)
+    cohort.load_engine('learner-0', engine)
+    for _, topic, difficulty, correct, time_taken in events[200:]:
+        engine.analyze_performance(correct, difficulty, time_taken, topic)
+    cohort.apply_events(*zip(*events[200:]))
+
+    assert_same_state(cohort.to_state('learner-0'), engine.to_state())
+
+
+def test_import_has_no_app_side_effects():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = 'import sys, cohort; assert "app" not in sys.modules'
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
@@ -0,0 +1,37 @@
+"""
+Per-learner locks prevent lost updates: with the engine's read-modify-write window widened,
+concurrent answers for the same learners lose updates without the locks and none with them
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import concurrency_stress as stress  # noqa: E402
+from concurrency_stress import app, synthetic_questions  # noqa: E402
+
+
+@pytest.fixture
+def stress_app(monkeypatch):
+    """The harness swaps app globals and patches the engine; put everything back afterwards"""
+    monkeypatch.setattr(app, 'question_bank', app.QuestionBank(synthetic_questions(200)))
+    monkeypatch.setattr(app, 'learner_state', app.learner_state)
+    monkeypatch.setattr(app, 'engine_sessions', app.engine_sessions)
+    monkeypatch.setattr(app, 'learner_locks', app.learner_locks)
+    undo = stress.widen_race_window(0.001)
+    yield monkeypatch
+    undo()
+
+
+@pytest.mark.parametrize('max_sessions', [None, 2], ids=['resident', 'evicting'])
+def test_locked_answers_are_exact(stress_app, max_sessions):
+    _, bad = stress.run(8, 4, 200, app.question_bank, seed=0, max_sessions=max_sessions)
+    assert bad == []
+
+
+def test_unlocked_answers_lose_updates(stress_app):
+    stress_app.setattr(app, 'learner_locks', stress.NoLocks())
+    _, bad = stress.run(8, 4, 200, app.question_bank, seed=0)
+    assert bad, 'the harness no longer detects lost updates'
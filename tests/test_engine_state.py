@@ -0,0 +1,95 @@
+"""
+Learner engine state: incrementally maintained readiness and insights, and the compact
+state round-trip used for persistence
+"""
+import random
+
+import pytest
+
+from app import CS_F111_AI_Engine, QuestionBank
+from persistence import MemoryStateBackend, WriteBehindWriter
+
+
+def answered_engine(answers=300, seed=0, reviews=True):
+    rng = random.Random(seed)
+    engine = CS_F111_AI_Engine()
+    engine.seed(seed)
+    for i in range(answers):
+        correct = rng.random() < 0.6
+        time_taken = rng.uniform(2, 60)
+        engine.analyze_performance(correct, rng.randint(1, 5), time_taken, rng.choice(engine.TOPICS))
+        if reviews:
+            engine.record_review(rng.randrange(1, 80), correct, time_taken, now=1000.0 + i)
+    return engine
+
+
+def full_readiness(engine):
+    """Exam readiness recomputed from scratch from the per-topic mastery"""
+    mastery = {topic: stats['mastery'] for topic, stats in engine.topic_performance.items()}
+    return (
+        min(100, sum(mastery[t] for t in engine.QUIZ_TOPICS) // len(engine.QUIZ_TOPICS) + engine.competence_level * 0.3),
+        min(100, sum(mastery[t] for t in engine.MIDSEM_TOPICS) // len(engine.MIDSEM_TOPICS) + engine.competence_level * 0.2),
+        min(100, sum(mastery.values()) // len(engine.TOPICS) + engine.competence_level * 0.1),
+    )
+
+
+def test_incremental_readiness_matches_full_recompute():
+    rng = random.Random(1)
+    engine = CS_F111_AI_Engine()
+    for _ in range(500):
+        engine.analyze_performance(rng.random() < 0.5, rng.randint(1, 5), rng.uniform(2, 60), rng.choice(engine.TOPICS))
+        assert (engine.quiz_readiness, engine.midsem_readiness, engine.endsem_readiness) == full_readiness(engine)
+
+
+def test_cached_insights_follow_every_answer():
+    rng = random.Random(2)
+    engine = CS_F111_AI_Engine()
+    for _ in range(100):
+        engine.get_performance_insights()   # Fill the cache, then invalidate it
+        engine.analyze_performance(rng.random() < 0.5, rng.randint(1, 5), rng.uniform(2, 60), rng.choice(engine.TOPICS))
+        cached = engine.get_performance_insights()
+        fresh = engine._build_insights()
+        cached.pop('session_time')
+        fresh.pop('session_time', None)
+        assert cached == fresh
+
+
+def test_state_round_trip():
+    engine = answered_engine()
+    restored = CS_F111_AI_Engine.from_state(engine.to_state())
+    assert restored.to_state() == engine.to_state()
+    assert CS_F111_AI_Engine.deserialize(engine.serialize()).serialize() == engine.serialize()
+    assert restored.get_performance_insights().keys() == engine.get_performance_insights().keys()
+
+
+def test_restored_engine_selects_like_the_original():
+    bank = QuestionBank([
+        {'id': i, 'topic': CS_F111_AI_Engine.TOPICS[i % 9], 'difficulty': 1 + i % 5} for i in range(1, 80)
+    ])
+    engine = answered_engine(seed=3)
+    restored = CS_F111_AI_Engine.deserialize(engine.serialize())
+    for _ in range(50):
+        assert restored.select_optimal_question(bank, now=2000.0) == engine.select_optimal_question(bank, now=2000.0)
+
+
+@pytest.mark.parametrize('version', [1, 2])
+def test_older_state_versions_load(version):
+    state = answered_engine(reviews=False).to_state()
+    old = [version] + state[1:19] + ([None] if version == 2 else [])
+    engine = CS_F111_AI_Engine.from_state(old)
+    assert engine.to_state()[1:19] == state[1:19]
+
+
+def test_unknown_state_version_is_rejected():
+    with pytest.raises(ValueError):
+        CS_F111_AI_Engine.from_state([99])
+
+
+def test_write_behind_round_trip():
+    backend = MemoryStateBackend()
+    writer = WriteBehindWriter(backend)
+    engine = answered_engine(seed=4)
+    writer.save('learner', engine.serialize())
+    assert writer.load('learner') == engine.serialize()   # Served from the queue before a flush
+    writer.close()
+    assert CS_F111_AI_Engine.deserialize(backend.load('learner')).to_state() == engine.to_state()
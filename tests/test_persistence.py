@@ -0,0 +1,43 @@
+"""
+Write-behind learner state: snapshots stay readable while they are being written
+"""
+import threading
+
+from persistence import MemoryStateBackend, WriteBehindWriter
+
+
+class BlockingBackend(MemoryStateBackend):
+    """Memory backend whose save_many waits until released"""
+    def __init__(self):
+        super().__init__()
+        self.saving = threading.Event()
+        self.release = threading.Event()
+
+    def save_many(self, items):
+        self.saving.set()
+        assert self.release.wait(5)
+        super().save_many(items)
+
+
+def test_load_during_flush_sees_the_batch():
+    backend = BlockingBackend()
+    writer = WriteBehindWriter(backend, flush_interval=60)
+    writer.save('learner', b'state-1')
+
+    flusher = threading.Thread(target=writer.flush)
+    flusher.start()
+    assert backend.saving.wait(5)
+    try:
+        assert backend.load('learner') is None     # Not committed yet
+        assert writer.load('learner') == b'state-1'
+        writer.save('learner', b'state-2')           # A newer snapshot wins over the in-flight one
+        assert writer.load('learner') == b'state-2'
+    finally:
+        backend.release.set()
+        flusher.join()
+
+    assert backend.load('learner') == b'state-1'
+    assert writer.load('learner') == b'state-2'
+    writer.close()
+    assert backend.load('learner') == b'state-2'
+    assert writer.stats()['pending'] == 0 and not writer._inflight
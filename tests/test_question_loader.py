@@ -0,0 +1,60 @@
+"""
+Binary question cache: a damaged cache is rebuilt from the bank file, never half-served
+"""
+import os
+import shutil
+
+import pytest
+
+from question_loader import (CACHE_FRAME, CACHE_HEADER, cache_is_fresh, default_cache_path,
+                             load_questions)
+
+BANK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_questions.json')
+
+
+@pytest.fixture
+def bank(tmp_path):
+    path = str(tmp_path / 'questions.json')
+    shutil.copyfile(BANK, path)
+    return path
+
+
+def _frame_offsets(cache_path):
+    with open(cache_path, 'rb') as fp:
+        data = fp.read()
+    offsets, offset = [], CACHE_HEADER.size
+    while offset < len(data):
+        offsets.append(offset)
+        (length,) = CACHE_FRAME.unpack_from(data, offset)
+        offset += CACHE_FRAME.size + length
+    return offsets
+
+
+def _damage_frame(cache_path, offset, length=None, body=None):
+    with open(cache_path, 'r+b') as fp:
+        if length is not None:
+            fp.seek(offset)
+            fp.write(CACHE_FRAME.pack(length))
+        if body is not None:
+            fp.seek(offset + CACHE_FRAME.size)
+            fp.write(body)
+
+
+@pytest.mark.parametrize('damage', ['garbled', 'truncated'])
+def test_corrupt_cache_is_rebuilt_from_the_bank(bank, damage):
+    expected = list(load_questions(bank))
+    cache_path = default_cache_path(bank)
+    assert cache_is_fresh(bank)
+
+    # Damage a record in the middle so earlier records decode fine
+    offsets = _frame_offsets(cache_path)
+    middle = offsets[len(offsets) // 2]
+    if damage == 'garbled':
+        _damage_frame(cache_path, middle, body=b'\xff\x00\xff')
+    else:
+        _damage_frame(cache_path, middle, length=2 ** 31)
+    assert cache_is_fresh(bank)     # The header alone cannot tell
+
+    assert list(load_questions(bank)) == expected
+    assert cache_is_fresh(bank)
+    assert list(load_questions(bank)) == expected   # Served from the rewritten cache
@@ -0,0 +1,94 @@
+"""
+Bucket-based question selection draws from the same distribution as the original
+filter-the-whole-bank implementation, for every learning mode
+"""
+import math
+from collections import Counter
+
+import pytest
+
+from app import CS_F111_AI_Engine, QuestionBank
+
+DRAWS = 20000
+WEAK_TOPICS = {'Pointers and Memory', 'Arrays and Strings'}
+
+# Engine settings that put a learner in each learning mode
+MODES = {
+    'mastery': dict(competence_level=80, confidence_level=80),
+    'support': dict(competence_level=30, engagement_score=70),
+    'gamified': dict(competence_level=60, engagement_score=40, confidence_level=60),
+    'confidence_building': dict(competence_level=50, engagement_score=80, confidence_level=30),
+    'balanced': dict(competence_level=50, engagement_score=80, confidence_level=60, preferred_difficulty=3.4),
+}
+
+
+def make_questions(difficulties=(1, 2, 3, 4, 5)):
+    topics = CS_F111_AI_Engine.TOPICS
+    return [
+        {'id': i, 'topic': topics[i % len(topics)], 'difficulty': difficulties[i % len(difficulties)]}
+        for i in range(1, 61)
+    ]
+
+
+def reference_probabilities(engine, questions):
+    """Exact selection probabilities of the original list-filtering implementation"""
+    mode = engine.get_learning_mode()
+    if mode == 'mastery':
+        keep = lambda d: d >= 4
+    elif mode == 'support':
+        keep = lambda d: d <= 2
+    elif mode == 'gamified':
+        keep = lambda d: 2 <= d <= 3
+    elif mode == 'confidence_building':
+        keep = lambda d: d == 1
+    else:
+        target = max(1, min(5, int(engine.preferred_difficulty)))
+        keep = lambda d: abs(d - target) <= 1
+    candidates = [q for q in questions if keep(q.get('difficulty', 1))] or list(questions)
+
+    probabilities = Counter()
+    weak = [q for q in candidates if q.get('topic', '') in engine.weak_topics]
+    if engine.weak_topics and len(candidates) > 1 and weak:
+        for q in weak:
+            probabilities[q['id']] += 0.7 / len(weak)
+        share = 0.3
+    else:
+        share = 1.0
+    for q in candidates:
+        probabilities[q['id']] += share / len(candidates)
+    return probabilities
+
+
+def chi_square_critical(dof, z=3.29):
+    """Upper chi-square quantile (p ~ 0.0005) by the Wilson-Hilferty approximation"""
+    return dof * (1 - 2 / (9 * dof) + z * math.sqrt(2 / (9 * dof))) ** 3
+
+
+def engine_in_mode(mode, seed):
+    engine = CS_F111_AI_Engine()
+    for name, value in MODES[mode].items():
+        setattr(engine, name, value)
+    engine.weak_topics = WEAK_TOPICS
+    engine.seed(seed)
+    assert engine.weak_topics == WEAK_TOPICS    # The setter drops topics outside the taxonomy
+    assert engine.get_learning_mode() == mode
+    return engine
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('difficulties', [(1, 2, 3, 4, 5), (2, 3)], ids=['all-levels', 'mode-fallback'])
+def test_bucket_selection_matches_reference(mode, difficulties):
+    questions = make_questions(difficulties)
+    bank = QuestionBank(questions)
+    engine = engine_in_mode(mode, seed=sorted(MODES).index(mode))
+
+    observed = Counter(engine.select_optimal_question(bank)['id'] for _ in range(DRAWS))
+    expected = reference_probabilities(engine, questions)
+
+    assert set(observed) <= set(expected), 'selected a question the reference never would'
+    statistic = sum((observed[qid] - p * DRAWS) ** 2 / (p * DRAWS) for qid, p in expected.items())
+    assert statistic < chi_square_critical(len(expected) - 1)
+
+
+def test_empty_bank_selects_nothing():
+    assert CS_F111_AI_Engine().select_optimal_question([]) is None